@@ -11,15 +11,30 @@ Date: 2020/11/16
 """
 
 import collections
-import datetime
+import concurrent.futures
+import glob
 import hashlib
+import itertools
 import json
+import math
+import mmap
 import multiprocessing
+import os
 import pathlib
 import re
+import time
+import weakref
 from antmocdata.log.fields import LogFields, expand_specs
 from antmocdata.log.options import LogOptions
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Log files smaller than this are read into memory rather than memory-mapped
+_MMAP_MIN_SIZE = 64 * 1024
+
 
 class LogFile(object):
     """Log file representation.
@@ -80,31 +95,50 @@ class LogFile(object):
 
     def __getitem__(self, name):
         """Return a field value."""
-        if name in self.data.keys():
+        if name in self.data:
             return self.data[name]
         else:
             raise KeyError(f"Field '{name}' was not found")
 
     def __setitem__(self, name, value):
         """Modify existing field value."""
-        if name in self.data.keys():
+        if name in self.data:
             self.data[name] = value
         else:
             raise KeyError(f"Field '{name}' was not found")
 
     def __str__(self):
+        if orjson is not None:
+            return orjson.dumps(self.data, option=orjson.OPT_INDENT_2).decode("utf-8")
         return json.dumps(self.data, indent=2)
 
     def hash(self):
         """Hash a logfile to get a unique id.
         It is no need to sort the data because it is an OrderedDict.
+        Items are fed to the digest one by one without serializing the data.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        for key, value in self.data.items():
+            h.update(key.encode("utf-8"))
+            h.update(b"\x00")
+            h.update(repr(value).encode("utf-8"))
+            h.update(b"\x01")
+        return h.hexdigest()
+
+    def legacy_hash(self):
+        """Return the md5 hash which named saved log files in earlier versions.
+        LogDB.save(...) looks up this name to skip log files saved before.
         """
         return hashlib.md5(json.dumps(self.data, indent=2).encode("utf-8")).hexdigest()
 
     def save(self, path, mode="x"):
         """Save data to a new file."""
-        with open(path, mode=mode) as file:
-            json.dump(obj=self.data, fp=file, indent=2)
+        if orjson is not None:
+            with open(path, mode=mode + "b") as file:
+                file.write(orjson.dumps(self.data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(path, mode=mode) as file:
+                json.dump(obj=self.data, fp=file, indent=2)
 
     def save_in_place(self):
         """Save data to the original file.
@@ -124,7 +158,8 @@ class LogFile(object):
     def findall(self, specs):
         """Search the log file for a list of field specs.
 
-        During this method, each spec will be expanded to concrete field names.
+        During this method, each spec will be expanded to concrete field names
+        unless it has been expanded.
 
         For each concrete field name,
         and field value will be returned.
@@ -147,15 +182,17 @@ class LogFile(object):
         not_found = []
 
         for spec in specs:
+            value = self[spec.name]
+
             # Use the predicate for filtering.
             # The predicate will handle value type.
-            if spec.pred(self[spec.name]):
-                field_values.append(self[spec.name])
-                if self[spec.name] is None:
-                    not_found.append(spec.name)
-            else:
+            if not spec.pred(value):
                 return None, None
 
+            field_values.append(value)
+            if value is None:
+                not_found.append(spec.name)
+
         return field_values, not_found
 
 
@@ -191,12 +228,16 @@ class LogDB(object):
     _filepatterns : list
         List of file name patterns
 
-    _files : dict, filename -> (path object, format)
-        Dictionary of pathlib paths and formats
+    _files : dict, full path -> (path, format)
+        Dictionary of file paths and formats
 
     _logfiles : dict, file path -> logfile object
         Dictionary of logfiles
 
+    _pool : multiprocessing.Pool
+        Worker pool shared by parallel operations, see close(). The pool is
+        also terminated when the object is garbage collected.
+
     Examples
     --------
     Instantiate an database object (a log file will be read only if it is accessed)
@@ -211,6 +252,14 @@ class LogDB(object):
     Query JobId and any field ended with 'Time'
     #>>> print(logdb.query(["JobId", ".*Time"]))
 
+    Terminate worker processes
+    >>> logdb.close()
+
+    Terminate worker processes on exiting a block
+    >>> with LogDB(nprocs = 4, filenames = ["./**/*.log"]) as logdb:
+    ...     print(logdb.nprocs)
+    4
+
     """
 
     def __init__(self, nprocs=1, filenames=[], fileformat="txt", cache=False):
@@ -226,7 +275,19 @@ class LogDB(object):
         self._files = collections.OrderedDict()
 
         # Cached log files
-        self._logfiles = multiprocessing.Manager().dict()
+        self._logfiles = {}
+
+        # Worker pool
+        self._pool = None
+        self._pool_size = 0
+        self._pool_fields = 0
+        self._pool_finalizer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def __getitem__(self, path_format):
         """Return a LogFile object by full path.
@@ -262,15 +323,74 @@ class LogDB(object):
             raise TypeError("The options passed to LogDB is of a wrong type")
 
     def reset(self):
-        """Reset attributes."""
+        """Reset attributes and terminate worker processes."""
         # FIXME: is the memory managed elegantly?
+        self.close()
         self._filepatterns = []
         self._files = collections.OrderedDict()
-        self._logfiles = multiprocessing.Manager().dict()
+        self._logfiles = {}
+
+    def close(self):
+        """Terminate worker processes."""
+        if self._pool is not None:
+            self._pool_finalizer.detach()
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def _starmap(self, func, args):
+        """Apply a function to arguments in the worker pool.
+        The pool is created on first use and kept until close() is called or
+        the object is garbage collected.
+        Workers see log fields as they were when the pool was created, so the
+        pool is created again after fields are changed.
+        """
+        args = list(args)
+        fields_version = LogFields().version()
+
+        if self._pool is not None and (
+            self._pool_size != self.nprocs or self._pool_fields != fields_version
+        ):
+            self.close()
+
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(
+                processes=self.nprocs, initializer=_worker_init
+            )
+            self._pool_size = self.nprocs
+            self._pool_fields = fields_version
+
+            # Terminate workers if the object is collected without close()
+            self._pool_finalizer = weakref.finalize(self, self._pool.terminate)
+
+        # Batch tasks to reduce dispatching overhead
+        chunksize = max(1, len(args) // (4 * self.nprocs))
+
+        return self._pool.starmap(func, args, chunksize=chunksize)
+
+    def _prefetch(self, paths):
+        """Ask the kernel to read files ahead before workers parse them.
+        Reads are issued asynchronously so that disk latency overlaps with
+        parsing. This is a no-op if posix_fadvise is not supported.
+        """
+        if not hasattr(os, "posix_fadvise") or len(paths) < 2:
+            return
+
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
 
     def has_file(self, path):
         """Check if a file path exists."""
-        return path.resolve() in self._files.keys()
+        return os.path.realpath(path) in self._files
 
     def add_paths(self, patterns, format=None):
         """Add file paths matching given patterns to the DB."""
@@ -293,9 +413,9 @@ class LogDB(object):
             # Cache patterns and file paths
             if pattern not in self._filepatterns:
                 new_patterns.append(pattern)
-                for f in [x for x in pathlib.Path().glob(pattern) if x.is_file()]:
-                    if not self.has_file(f):
-                        self._files[f.resolve()] = (f, format)
+                for f in glob.iglob(pattern, recursive=True):
+                    if os.path.isfile(f):
+                        self._files.setdefault(os.path.realpath(f), (f, format))
 
         # Incrementally add new patterns and update the file list
         self._filepatterns.extend(new_patterns)
@@ -308,27 +428,6 @@ class LogDB(object):
         """Remove file paths matching given patterns."""
         pass
 
-    def _dump_to_file(self, path, directory):
-        """Save a single log file to a directory.
-        path : string, full path to the file
-        directory : PosixPath, path to save log files
-
-        Returns
-        -------
-        True : dumped
-        False : skipped
-        """
-        # Get a cached log file, or create it
-        logfile = self[path]
-
-        filepath = directory / f"{logfile.hash()}.json"
-
-        if filepath.exists():
-            return False
-        else:
-            logfile.save(filepath.resolve(), mode="x")
-            return True
-
     def save(self, directory):
         """Save log files to a directory.
         Each file is in JSON format and will be named with a hash number.
@@ -347,12 +446,35 @@ class LogDB(object):
             # Create a new directory
             path.mkdir()
 
-        # Generate arguments for starmap
-        arg_paths = self._files.keys()
-        arg_dirs = [path for x in self._files.values()]
-
-        with multiprocessing.Pool(processes=self.nprocs) as pool:
-            are_dumped = pool.starmap(self._dump_to_file, zip(arg_paths, arg_dirs))
+        # Read log files which are not cached in worker processes
+        arg_paths = [x for x in self._files.keys() if x not in self._logfiles]
+        arg_fmts = [self._files[x][1] for x in arg_paths]
+
+        self._prefetch(arg_paths)
+
+        logfiles = self._starmap(LogFile, zip(arg_paths, arg_fmts))
+        logfiles = dict(zip(arg_paths, logfiles))
+        logfiles.update(self._logfiles)
+
+        if self.cache:
+            self._logfiles = logfiles
+
+        # Files saved by earlier versions are named by legacy hashes, which are
+        # looked up only if there are saved files
+        legacy = any(path.glob("*.json"))
+
+        # Dump log files in threads because it is mostly I/O
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=2 * self.nprocs
+        ) as executor:
+            are_dumped = list(
+                executor.map(
+                    _dump_logfile,
+                    [logfiles[x] for x in self._files.keys()],
+                    itertools.repeat(path),
+                    itertools.repeat(legacy),
+                )
+            )
 
         n_dumped = sum([1 for x in are_dumped if x])
         n_skipped = len(are_dumped) - n_dumped
@@ -383,12 +505,15 @@ class LogDB(object):
         # Counting files
         count = -len(self._logfiles)
 
-        # Generate arguments for starmap
-        arg_paths = self._files.keys()
-        arg_fmts = [x[1] for x in self._files.values()]
+        # Generate arguments for starmap, skipping cached files
+        arg_paths = [x for x in self._files.keys() if x not in self._logfiles]
+        arg_fmts = [self._files[x][1] for x in arg_paths]
 
-        with multiprocessing.Pool(processes=self.nprocs) as pool:
-            pool.starmap(self.cache_file, zip(arg_paths, arg_fmts))
+        self._prefetch(arg_paths)
+
+        logfiles = self._starmap(LogFile, zip(arg_paths, arg_fmts))
+
+        self._logfiles.update(zip(arg_paths, logfiles))
 
         count += len(self._logfiles)
 
@@ -445,31 +570,109 @@ class LogDB(object):
         print(
             "LogDB: file name patterns =\n\t{}".format("\n\t".join(self._filepatterns))
         )
-        print(f"LogDB: field specs =\n\t{', '.join(specs)}")
+        print(f"LogDB: field specs =\n\t{', '.join(str(x) for x in specs)}")
+
+        # Expand field specs once for all files
+        specs = expand_specs(specs)
 
         # Generate arguments for starmap
         arg_paths = self._files.keys()
         arg_fmts = [x[1] for x in self._files.values()]
-        arg_specs = [specs for x in range(len(self._files))]
+        arg_specs = itertools.repeat(specs)
+        arg_logfiles = [self._logfiles.get(x) for x in arg_paths]
 
-        with multiprocessing.Pool(processes=self.nprocs) as pool:
-            records = pool.starmap(self.query_file, zip(arg_paths, arg_fmts, arg_specs))
+        self._prefetch([x for x in arg_paths if x not in self._logfiles])
 
-        # Remove None values
-        records = [x for x in records if x]
+        results = self._starmap(
+            _query_logfile, zip(arg_paths, arg_fmts, arg_specs, arg_logfiles)
+        )
+
+        # Cache log files read by workers
+        if self.cache:
+            self._logfiles.update(zip(arg_paths, [x[0] for x in results]))
+
+        # Remove excluded files
+        records = [x for x in results if x[1] is not None]
 
         print(f"LogDB: current cached files = {len(self._logfiles)}")
 
         # Sort by the specified key. Before that, a value must be converted to
         # the proper type, otherwise floating-point numbers will not be handled
         # properly.
-        logfields = LogFields()
         if sortby:
-            records.sort(key=lambda record: logfields[sortby].dtype(record[0][sortby]))
+            dtype = LogFields()[sortby].dtype
+            records.sort(key=lambda record: dtype(record[0][sortby]))
 
         return records
 
 
+def _worker_init():
+    """Initialize a worker process.
+    Fields and the field scanner are compiled once for all tasks of the worker.
+    """
+    LogFields().scanner()
+
+
+def _query_logfile(path, format, specs, logfile=None):
+    """Query a single log file with field specs in a worker process.
+
+    Parameters
+    ----------
+    path : string
+        Full path to the file
+    format : string
+        File format
+    specs :  list
+        List of field specs to be queried
+    logfile : LogFile, optional
+        A cached log file. The file will be read if it is None.
+
+    Returns
+    -------
+    (logfile, [field values], [field not found]) :
+        A tuple of results. The values are None if the file was excluded.
+    """
+    if logfile is None:
+        logfile = LogFile(path, format=format)
+
+    values, broken_fields = logfile.findall(specs)
+
+    return (logfile, values, broken_fields)
+
+
+def _dump_logfile(logfile, directory, legacy=False):
+    """Save a single log file to a directory.
+
+    Parameters
+    ----------
+    logfile : LogFile
+        The log file to be saved
+    directory : PosixPath
+        Path to save log files
+    legacy : bool, optional
+        Whether to skip log files saved with legacy hashes, see LogFile.legacy_hash()
+
+    Returns
+    -------
+    True : dumped
+    False : skipped
+    """
+    filepath = directory / f"{logfile.hash()}.json"
+
+    if filepath.exists():
+        return False
+
+    if legacy and (directory / f"{logfile.legacy_hash()}.json").exists():
+        return False
+
+    try:
+        logfile.save(filepath.resolve(), mode="x")
+    except FileExistsError:
+        # The same log has been saved by another thread
+        return False
+    return True
+
+
 class LogFileSerializer(object):
     """A serializer for reading and writing log fiels.
 
@@ -520,58 +723,165 @@ class LogFileSerializerTXT(object):
     def load(self, path):
         """Load a file and parse it to return a dictionary."""
 
-        # Initialize a PosixPath
-        path = pathlib.Path(path)
-        stat = path.stat()
+        stat = os.stat(path)
 
         # Initialize a dictionary for underlying data
         data = collections.OrderedDict(
             [
                 ("JobId", ""),
-                ("File", str(path)),
-                ("FileTimeStamp", str(datetime.datetime.fromtimestamp(stat.st_mtime))),
+                ("File", os.fspath(path)),
+                ("FileTimeStamp", _format_timestamp(stat.st_mtime)),
                 ("FileSize", f"{(stat.st_size / 1000):.1f}"),  # KB
             ]
         )
 
         # Extract jobid from the file name
-        id_matched = re.match(r"^([0-9]+)-", path.name, re.I)
+        id_matched = re.match(r"^([0-9]+)-", os.path.basename(path), re.I)
 
         if id_matched:
             data["JobId"] = id_matched.group(1)
 
-        # Extract each field from the file
-        f = open(path, mode="r")
-        file_content = f.read()
-        f.close()
+        # Extract each field from the memory-mapped file. Small files are read
+        # directly since mapping them costs more than copying.
+        with open(path, mode="rb") as f:
+            if os.fstat(f.fileno()).st_size >= _MMAP_MIN_SIZE:
+                file_content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                file_content = f.read()
 
         logfields = LogFields()
-        for field in logfields.values():
+
+        # Find out patterns occurring in the file
+        scanner = logfields.scanner()
+        candidates = scanner.scan(file_content)
+
+        # Find the last match of the first matching pattern for each field
+        matches = _search_fields(file_content, scanner.table, candidates)
+
+        for field, patterns in scanner.table:
             try:
-                # Try all possible patterns until the first match
-                pattern_found = False
-                for pattern in field.patterns:
-                    re_matched = re.findall(pattern, file_content, re.I)
-                    if re_matched:
-                        data[field.name] = re_matched[-1]
-
-                        # Try to convert the string to field dtype.
-                        # We don't really want this value being stored in the
-                        # object because it will prevent us to filter log files
-                        # by perl regex.
-                        field.dtype(re_matched[-1])
-
-                        pattern_found = True
-                        break
-                if field.patterns and not pattern_found:
+                if field.name in matches:
+                    # Decode the last match only, removing the carriage
+                    # return left by CRLF line endings
+                    value = matches[field.name].decode("utf-8")
+                    if value.endswith("\r"):
+                        value = value[:-1]
+                    data[field.name] = value
+
+                    # Try to convert the string to field dtype.
+                    # We don't really want this value being stored in the
+                    # object because it will prevent us to filter log files
+                    # by perl regex.
+                    field.dtype(value)
+                elif patterns:
                     raise TypeError()
             except:
                 # Set the value to empty if failed to parse a field
                 data[field.name] = None
 
+        if isinstance(file_content, mmap.mmap):
+            file_content.close()
+
         return data
 
 
+def _format_timestamp(timestamp):
+    """Format a POSIX timestamp in local time.
+    The result is the same as str(datetime.datetime.fromtimestamp(timestamp)),
+    without creating a datetime object.
+    """
+    seconds = math.floor(timestamp)
+    microseconds = round((timestamp - seconds) * 1e6)
+    if microseconds >= 1000000:
+        seconds += 1
+        microseconds -= 1000000
+
+    text = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(seconds))
+    if microseconds:
+        text += f".{microseconds:06d}"
+    return text
+
+
+def _search_fields(content, table, candidates, block_size=64 * 1024):
+    """Search file content for fields.
+
+    For each field, patterns are tried in order and the first one matching
+    the content wins. The value of a field is the last match of its winning
+    pattern.
+
+    The content is searched backwards in blocks of whole lines, so that the
+    last match of a linewise pattern is found in the first block it matches.
+    The search stops as soon as the winning pattern of every field is known.
+    Patterns which are not linewise are searched in the whole content.
+
+    Parameters
+    ----------
+    content : bytes-like
+        File content
+    table : list
+        Field table, see FieldScanner.table
+    candidates : set
+        Patterns which may occur in the content, see FieldScanner.scan()
+    block_size : int, optional
+        Minimum number of bytes searched at a time
+
+    Returns
+    -------
+    dict, field name -> last match
+    """
+    # Patterns to be searched for each field, [(key, regex)]
+    pending = []
+    # Last matches of patterns, key -> last match
+    found = {}
+
+    for field, patterns in table:
+        linewise = []
+        for key, regex, is_linewise in patterns:
+            if key not in candidates:
+                continue
+            if is_linewise:
+                linewise.append((key, regex))
+            else:
+                re_matched = regex.findall(content)
+                if re_matched:
+                    found[key] = re_matched[-1]
+                    break
+        if linewise:
+            pending.append(linewise)
+
+    end = len(content)
+    while pending and end > 0:
+        # The block starts at a line beginning and ends before a newline
+        start = content.rfind(b"\n", 0, max(end - block_size, 0)) + 1
+
+        unresolved = []
+        for patterns in pending:
+            for key, regex in patterns:
+                # Skip patterns which cannot win
+                if key in found:
+                    break
+                re_matched = regex.findall(content, start, end)
+                if re_matched:
+                    found[key] = re_matched[-1]
+                    break
+
+            # Check if the first pattern which may still match has matched
+            if patterns[0][0] not in found:
+                unresolved.append(patterns)
+
+        pending = unresolved
+        end = start - 1
+
+    matches = {}
+    for field, patterns in table:
+        for key, regex, is_linewise in patterns:
+            if key in found:
+                matches[field.name] = found[key]
+                break
+
+    return matches
+
+
 class LogFileSerializerJSON(object):
     """A JSON serializer for log files."""
 
@@ -583,7 +893,11 @@ class LogFileSerializerJSON(object):
         return cls.instance
 
     def load(self, path):
-        with open(path, mode="r") as file:
-            data = json.load(file)
+        if orjson is not None:
+            with open(path, mode="rb") as file:
+                data = orjson.loads(file.read())
+        else:
+            with open(path, mode="r") as file:
+                data = json.load(file)
 
         return data
@@ -89,12 +89,12 @@ class TinyExtractor(object):
         print("Current time:\n\t{}\n".format(datetime.datetime.now()))
         print("Output file:\n\t{}\n".format(self.output))
 
-        # Extract records in parallel
-        record_list = self.logdb.query(specs=self.specs, sortby=self.sortby)
-
-        # Expand field patterns for output
+        # Expand field patterns once for querying and output
         specs = antmocdata.log.fields.expand_specs(self.specs)
 
+        # Extract records in parallel
+        record_list = self.logdb.query(specs=specs, sortby=self.sortby)
+
         mode = "w" if self.truncate else "a"
 
         # Output
@@ -113,19 +113,23 @@ class TinyExtractor(object):
 
             logfields = antmocdata.log.fields.LogFields()
 
-            for record in record_list:
-                # Format the record lines
-                fmt_line = []
-                for i in range(len(record[1])):
-                    v = record[1][i]
-                    dtype = logfields[specs[i].name].dtype
-                    fmt = logfields[specs[i].name].fmt
-                    fmt_line.append(fmt.format(dtype(v)) if v is not None else "")
-
-                # Print records to stdout & file
-                if not self.summary:
+            # Types and formats of columns
+            columns = [(logfields[x.name].dtype, logfields[x.name].fmt) for x in specs]
+
+            # Format the record lines
+            fmt_lines = [
+                [
+                    fmt.format(dtype(v)) if v is not None else ""
+                    for v, (dtype, fmt) in zip(record[1], columns)
+                ]
+                for record in record_list
+            ]
+
+            # Print records to stdout & file
+            if not self.summary:
+                for fmt_line in fmt_lines:
                     print(self.delimiter.join(fmt_line))
-                csvwriter.writerow(fmt_line)
+            csvwriter.writerows(fmt_lines)
 
         # Print number of records which has broken fields
         if not self.summary:
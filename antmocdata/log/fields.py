@@ -9,7 +9,8 @@ field value.
 The LogFields reads default fields from a file at the initialization, so we
 need to make sure the data file exists ("default_fields.json").
 
-Classes: Field, LogFields, FieldSpec, FieldPredicate, FieldEncoder, FieldsEncoder
+Classes: Field, LogFields, FieldScanner, FieldSpec, FieldPredicate, FieldEncoder,
+    FieldsEncoder
 
 Functions: help_fields, expand_specs, dump, load
 
@@ -19,11 +20,31 @@ Date: 2020/11/16
 
 """
 
-import collections
 import json
+import operator
 import re
 import antmocdata.log.fields
 
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:
+    import sre_constants, sre_parse
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class Field(object):
     """A log field.
@@ -41,10 +62,21 @@ class Field(object):
 
     patterns : string list, optional (default: [])
         Possible perl regex used to read values from log files (TXT serializer only).
+        The patterns are compiled once at construction and stored in attribute
+        'regexes' as bytes patterns, which are applied to raw file contents.
+        Patterns are compiled by re2 if it is available and supports them.
+        The longest lowercase literal of each pattern is stored in attribute
+        'hints', which must occur in a file for the pattern to match. Whether
+        matches of each pattern are confined to single lines is stored in
+        attribute 'linewise'.
 
     doc : string, optional (default "")
         Field docstring.
 
+    case_sensitive : bool, optional (default: False)
+        Whether the patterns are matched case-sensitively. Case-sensitive
+        patterns allow the regex engine to search for literal prefixes faster.
+
     Examples
     --------
 
@@ -63,13 +95,28 @@ class Field(object):
 
     """
 
-    def __init__(self, name, dtype=str, fmt="{}", patterns=[], doc=""):
+    __slots__ = (
+        "name",
+        "dtype",
+        "fmt",
+        "patterns",
+        "doc",
+        "case_sensitive",
+        "regexes",
+        "hints",
+        "linewise",
+    )
+
+    def __init__(
+        self, name, dtype=str, fmt="{}", patterns=[], doc="", case_sensitive=False
+    ):
 
         self.name = name
         self.dtype = dtype
         self.fmt = fmt
         self.patterns = patterns
         self.doc = doc
+        self.case_sensitive = case_sensitive
 
         if not isinstance(dtype, type):
             raise TypeError(f"dtype '{dtype}' is not a type object")
@@ -80,6 +127,19 @@ class Field(object):
         if isinstance(patterns, str):
             self.patterns = [patterns]
 
+        self.compile()
+
+    def compile(self):
+        """Compile the patterns of this field.
+        This method should be called again if the patterns are modified.
+        """
+        self.regexes = [
+            _compile_pattern(x.encode("utf-8"), self.case_sensitive)
+            for x in self.patterns
+        ]
+        self.hints = [_literal_hint(x).encode("utf-8") for x in self.patterns]
+        self.linewise = [_is_linewise(x) for x in self.patterns]
+
     def serialized(self):
         data = {
             "name": self.name,
@@ -87,6 +147,7 @@ class Field(object):
             "fmt": self.fmt,
             "patterns": self.patterns,
             "doc": self.doc,
+            "case_sensitive": self.case_sensitive,
         }
         return data
 
@@ -94,6 +155,42 @@ class Field(object):
         return json.dumps(self, cls=FieldEncoder, indent=2)
 
 
+def _compile_pattern(pattern, case_sensitive=False):
+    """Compile a bytes pattern with re2, or with re if re2 rejects it."""
+    if re2 is not None:
+        options = re2.Options()
+        options.case_sensitive = case_sensitive
+        options.log_errors = False
+        try:
+            return _RE2Regex(re2.compile(pattern, options))
+        except re2.error:
+            pass
+
+    return re.compile(pattern, 0 if case_sensitive else re.I)
+
+
+class _RE2Regex(object):
+    """A re2 regex with findall working on any bytes-like object.
+    The findall method of re2 fails on memory maps.
+    """
+
+    def __init__(self, regex):
+        self.regex = regex
+        self.pattern = regex.pattern
+        self.groups = regex.groups
+
+    def findall(self, string, pos=None, endpos=None):
+        items = []
+        for match in self.regex.finditer(string, pos, endpos):
+            if not self.groups:
+                items.append(match.group())
+            elif self.groups == 1:
+                items.append(match.groups(default=b"")[0])
+            else:
+                items.append(match.groups(default=b""))
+        return items
+
+
 class LogFields(object):
     """Log fields.
 
@@ -150,6 +247,7 @@ class LogFields(object):
                     f"Field name '{field.name}' doesn't match the key '{name}'"
                 )
             self.data[name] = field
+            self._reset_caches()
         else:
             raise TypeError(
                 f"Object '{field}' is not a Field and cannot be added to LogFields"
@@ -162,6 +260,7 @@ class LogFields(object):
         """Add a Field object"""
         if isinstance(field, Field):
             self.data[field.name] = field
+            self._reset_caches()
         else:
             raise TypeError(
                 f"Object '{field}' is not a Field and cannot be added to LogFields"
@@ -181,19 +280,332 @@ class LogFields(object):
 
     def names(self):
         """Return field names."""
-        return self.keys()
+        return self._column("name")
 
     def dtypes(self):
         """Return field dtypes."""
-        return [x.dtype for x in self.values()]
+        return self._column("dtype")
 
     def patterns(self):
         """Return list of field patterns."""
-        return [x.patterns for x in self.values()]
+        return self._column("patterns")
 
     def docs(self):
         """Return field docstrings."""
-        return [x.doc for x in self.values()]
+        return self._column("doc")
+
+    def _column(self, attr):
+        """Return a tuple of an attribute of all fields.
+        The tuple is cached until fields are changed.
+        """
+        if attr not in self._columns:
+            self._columns[attr] = tuple(getattr(x, attr) for x in self.values())
+        return self._columns[attr]
+
+    def _reset_caches(self):
+        """Drop objects derived from fields."""
+        self._columns = {}
+        self._scanner = None
+        self._version = getattr(self, "_version", 0) + 1
+
+    def version(self):
+        """Return a counter which is increased whenever fields are changed."""
+        return self._version
+
+    def scanner(self):
+        """Return a FieldScanner for the current fields.
+        The scanner is built on first use and rebuilt after fields are changed.
+        """
+        if self._scanner is None:
+            self._scanner = FieldScanner(self.values())
+        return self._scanner
+
+
+class FieldScanner(object):
+    """A multi-pattern scanner for log fields.
+
+    The scanner compiles the patterns of all fields into a single Hyperscan
+    database, so that a file is scanned only once to find out which of the
+    patterns occur in it. Values are still extracted by the compiled regexes
+    of each field, but only for patterns reported by the scanner.
+
+    Patterns that Hyperscan fails to compile, or all of the patterns if the
+    package hyperscan is not available, are grouped by their leading literal
+    characters. Patterns in a group are joined into one alternation, which
+    is searched once to tell whether any of them occurs. Patterns with group
+    references, named groups or global inline flags are searched on their own. Patterns without a
+    leading literal are reported if their literal hints occur, or always
+    reported if they have no hints.
+
+    Patterns are always scanned case-insensitively, so case-sensitive fields
+    may be reported without matching.
+
+    Each pattern is identified by a tuple (field name, pattern index).
+
+    The scanner also keeps a flat table of fields for the TXT serializer, in
+    which each field is stored with a tuple of its patterns, as tuples of
+    (pattern id, compiled regex, linewise flag).
+
+    Parameters
+    ----------
+    fields : iterable
+        Field objects to be scanned for.
+
+    Examples
+    --------
+
+    >>> scanner = FieldScanner([Field(name="Azims", patterns=["azimuthal angles = (.+)"])])
+
+    >>> ("Azims", 0) in scanner.scan(b"Azimuthal angles = 32")
+    True
+
+    >>> ("Azims", 0) in scanner.scan(b"Polar angles = 6")
+    False
+
+    """
+
+    def __init__(self, fields):
+        # Identifiers of patterns
+        self.keys = []
+        self.table = []
+        patterns = []
+        hints = []
+        for field in fields:
+            for i, pattern in enumerate(field.patterns):
+                self.keys.append((field.name, i))
+                patterns.append(pattern)
+                hints.append(field.hints[i])
+
+            self.table.append(
+                (
+                    field,
+                    tuple(
+                        ((field.name, i), regex, linewise)
+                        for i, (regex, linewise) in enumerate(
+                            zip(field.regexes, field.linewise)
+                        )
+                    ),
+                )
+            )
+
+        self.database = None
+
+        # Indices of patterns to be scanned without Hyperscan
+        fallback = list(range(len(patterns)))
+
+        if hyperscan is not None and patterns:
+            fallback = self._compile_database(patterns)
+
+        # Group the rest of patterns by leading literals
+        groups = {}
+        self.always = set()
+        self.groups = []
+        for i in fallback:
+            prefix = _leading_literal(patterns[i])
+            if prefix and _is_joinable(patterns[i]):
+                groups.setdefault(prefix, []).append(i)
+            elif prefix:
+                self._add_pattern(patterns[i], self.keys[i])
+            elif hints[i]:
+                # Search for the literal hint only
+                regex = re.compile(re.escape(hints[i]), re.I)
+                self.groups.append((regex, [self.keys[i]]))
+            else:
+                self.always.add(self.keys[i])
+
+        for indices in groups.values():
+            expression = "|".join(f"(?:{patterns[i]})" for i in indices)
+            try:
+                regex = re.compile(expression.encode("utf-8"), re.I)
+                self.groups.append((regex, [self.keys[i] for i in indices]))
+            except re.error:
+                for i in indices:
+                    self._add_pattern(patterns[i], self.keys[i])
+
+    def _add_pattern(self, pattern, key):
+        """Search for a pattern on its own.
+        Patterns rejected by re are always reported.
+        """
+        try:
+            regex = re.compile(pattern.encode("utf-8"), re.I)
+            self.groups.append((regex, [key]))
+        except re.error:
+            self.always.add(key)
+
+    def _compile_database(self, patterns):
+        """Compile patterns into a Hyperscan database.
+        Return indices of patterns which are not supported by Hyperscan.
+        """
+        flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH
+
+        expressions = [x.encode("utf-8") for x in patterns]
+        ids = []
+        unsupported = []
+        for i, expression in enumerate(expressions):
+            try:
+                hyperscan.Database().compile(expressions=[expression], flags=flags)
+                ids.append(i)
+            except hyperscan.error:
+                unsupported.append(i)
+
+        if ids:
+            self.database = hyperscan.Database()
+            self.database.compile(
+                expressions=[expressions[i] for i in ids], ids=ids, flags=flags
+            )
+
+        return unsupported
+
+    def scan(self, content):
+        """Return the set of patterns which may occur in the content.
+        The content is expected to be bytes.
+        """
+        found = set(self.always)
+
+        for regex, keys in self.groups:
+            if regex.search(content):
+                found.update(keys)
+
+        if self.database is not None:
+            keys = self.keys
+
+            def on_match(id, start, end, flags, context):
+                found.add(keys[id])
+
+            self.database.scan(content, match_event_handler=on_match)
+
+        return found
+
+
+def _literal_hint(pattern):
+    """Return the longest lowercase ASCII literal of a pattern, or ''."""
+    try:
+        parsed = sre_parse.parse(pattern, re.I)
+    except re.error:
+        return ""
+
+    hint = run = ""
+    for op, av in parsed:
+        if op is sre_constants.LITERAL and av < 128:
+            run += chr(av).lower()
+            if len(run) > len(hint):
+                hint = run
+        else:
+            run = ""
+    return hint
+
+
+def _is_linewise(pattern):
+    """Check if any match of a pattern must be within a single line.
+    Patterns with anchors, lookbehinds, or items that may match newlines are
+    not linewise.
+    """
+    try:
+        flags = re.compile(pattern, re.I).flags
+        parsed = sre_parse.parse(pattern, re.I)
+    except re.error:
+        return False
+
+    if flags & (re.S | re.M):
+        return False
+    return _items_are_linewise(parsed)
+
+
+def _items_are_linewise(items):
+    """Check if parsed regex items never match a newline."""
+    c = sre_constants
+    newline = ord("\n")
+    repeats = [
+        c.MAX_REPEAT,
+        c.MIN_REPEAT,
+        getattr(c, "POSSESSIVE_REPEAT", c.MAX_REPEAT),
+    ]
+
+    for op, av in items:
+        if op == c.LITERAL:
+            if av == newline:
+                return False
+        elif op == c.NOT_LITERAL:
+            if av != newline:
+                return False
+        elif op == c.ANY:
+            pass
+        elif op == c.IN:
+            for set_op, set_av in av:
+                if set_op == c.LITERAL:
+                    if set_av == newline:
+                        return False
+                elif set_op == c.RANGE:
+                    if set_av[0] <= newline <= set_av[1]:
+                        return False
+                elif set_op == c.CATEGORY:
+                    if set_av not in (
+                        c.CATEGORY_DIGIT,
+                        c.CATEGORY_WORD,
+                        c.CATEGORY_NOT_SPACE,
+                        c.CATEGORY_NOT_LINEBREAK,
+                    ):
+                        return False
+                else:
+                    return False
+        elif op in repeats:
+            if not _items_are_linewise(av[2]):
+                return False
+        elif op == c.SUBPATTERN:
+            if av[1] & (re.S | re.M) or not _items_are_linewise(av[-1]):
+                return False
+        elif op == c.BRANCH:
+            if not all(_items_are_linewise(x) for x in av[1]):
+                return False
+        elif op in (c.ASSERT, c.ASSERT_NOT):
+            if av[0] < 0 or not _items_are_linewise(av[1]):
+                return False
+        elif op == c.AT:
+            if av not in (c.AT_BOUNDARY, c.AT_NON_BOUNDARY):
+                return False
+        elif op != c.GROUPREF:
+            return False
+
+    return True
+
+
+def _is_joinable(pattern):
+    """Check if a pattern can be joined with others into one alternation.
+    Patterns with group references, named groups, or global inline flags
+    depend on being compiled on their own.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return False
+
+    if parsed.state.flags & ~re.U or parsed.state.groupdict:
+        return False
+    return not _refers_to_groups(parsed)
+
+
+def _refers_to_groups(items):
+    """Check if parsed regex items contain group references."""
+    for op, av in items:
+        if op in (sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS):
+            return True
+        for child in av if isinstance(av, (tuple, list)) else ():
+            for x in child if isinstance(child, list) else [child]:
+                if isinstance(x, sre_parse.SubPattern) and _refers_to_groups(x):
+                    return True
+    return False
+
+
+def _leading_literal(pattern):
+    """Return the lowercase leading literal character of a pattern, or None."""
+    try:
+        parsed = sre_parse.parse(pattern, re.I)
+    except re.error:
+        return None
+
+    if len(parsed) and parsed[0][0] is sre_constants.LITERAL:
+        return chr(parsed[0][1]).lower()
+    return None
 
 
 class FieldEncoder(json.JSONEncoder):
@@ -221,20 +633,27 @@ def decode_field(json_obj):
             fmt=json_obj["fmt"],
             patterns=json_obj["patterns"],
             doc=json_obj["doc"],
+            case_sensitive=json_obj.get("case_sensitive", False),
         )
     return json_obj
 
 
 def dump(obj, path, mode="x"):
     """Save a field or fields to a json file."""
-    with open(path, mode=mode) as file:
-        if isinstance(obj, Field):
-            encoder = FieldEncoder
-        elif isinstance(obj, LogFields):
-            encoder = FieldsEncoder
-        else:
-            raise NotImplementedError("Only Field or LogFields can be dumped")
-        json.dump(obj, fp=file, indent=2, cls=encoder)
+    if isinstance(obj, Field):
+        encoder = FieldEncoder
+    elif isinstance(obj, LogFields):
+        encoder = FieldsEncoder
+    else:
+        raise NotImplementedError("Only Field or LogFields can be dumped")
+
+    if orjson is not None:
+        data = encoder().default(obj)
+        with open(path, mode=mode + "b") as file:
+            file.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, mode=mode) as file:
+            json.dump(obj, fp=file, indent=2, cls=encoder)
 
 
 def load(path):
@@ -242,20 +661,32 @@ def load(path):
     LogFields is currently implemented by singleton, so we have to change its
     attributes after decoding the json file.
     """
-    with open(path, mode="r") as file:
-        data = json.load(fp=file, object_hook=decode_field)
-        if isinstance(data, Field):
-            return data
+    if orjson is not None:
+        with open(path, mode="rb") as file:
+            data = orjson.loads(file.read())
+
+        # orjson has no object hook, the fields are decoded one by one
+        if isinstance(data, dict):
+            data = decode_field(data)
+        elif isinstance(data, list):
+            data = [decode_field(x) if isinstance(x, dict) else x for x in data]
+    else:
+        with open(path, mode="r") as file:
+            data = json.load(fp=file, object_hook=decode_field)
+
+    if isinstance(data, Field):
+        return data
 
-        # The data is supposed to be a list of fields
-        try:
-            logfields = LogFields()
-            logfields.data = collections.OrderedDict()
-            for field in data:
-                logfields.data[field.name] = field
-            return logfields
-        except:
-            raise NotImplementedError("Only Field or LogFields can be loaded")
+    # The data is supposed to be a list of fields
+    try:
+        logfields = LogFields()
+        logfields.data = {}
+        logfields._reset_caches()
+        for field in data:
+            logfields.data[field.name] = field
+        return logfields
+    except:
+        raise NotImplementedError("Only Field or LogFields can be loaded")
 
 
 def add(field):
@@ -269,17 +700,26 @@ def add(field):
 def help_fields():
     """Help message for available fields."""
 
-    logfields = LogFields()
-    wfield = max([len(x) for x in logfields.names()])
-    wtype = max([len(x.__name__) for x in logfields.dtypes()])
-    msg = []
-    for field in logfields.values():
+    # Collect rows and column widths in a single pass
+    rows = []
+    wfield = wtype = 0
+    for field in LogFields().values():
         type_str = f"({field.dtype.__name__})"
-        msg.append(f"{field.name: <{wfield}}{type_str: <{wtype+2}} : {field.doc}")
+        rows.append((field.name, type_str, field.doc))
+        wfield = max(wfield, len(field.name))
+        wtype = max(wtype, len(type_str))
+
+    msg = [
+        f"{name: <{wfield}}{type_str: <{wtype}} : {doc}" for name, type_str, doc in rows
+    ]
 
     print("\nAvailable fields:\n{}\n".format("\n".join(msg)))
 
 
+# Field spec in the form of name, op and value
+_SPEC_RE = re.compile(r"^([^<=>]+)([<>]=?|==)?([^<=>]*)$")
+
+
 class FieldSpec(object):
     """Field name pattern and predicate.
 
@@ -371,10 +811,12 @@ class FieldSpec(object):
 
     """
 
+    __slots__ = ("name", "op", "value", "pred", "re_name")
+
     def __init__(self, spec):
         """Unpack a field spec string."""
 
-        re_matched = re.match(r"^([^<=>]+)([<>]=?|==)?([^<=>]*)$", spec)
+        re_matched = _SPEC_RE.match(spec)
         if re_matched:
             name, op, value = re_matched.groups()
             op = "" if op is None else op
@@ -394,6 +836,9 @@ class FieldSpec(object):
         # This attribute can only be set to a concrete Field spec
         self.pred = None
 
+        # Regex of the field name, compiled on first expansion
+        self.re_name = None
+
     def __str__(self):
         return f"{self.name}{self.op}{self.value}"
 
@@ -418,11 +863,12 @@ class FieldSpec(object):
         specs = []
 
         # Set the regex to field name
-        re_field = re.compile(f"^{self.name}$")
+        if self.re_name is None:
+            self.re_name = re.compile(f"^{self.name}$")
 
         # Search for matched names
         for field_name in LogFields().names():
-            re_matched = re_field.match(field_name)
+            re_matched = self.re_name.match(field_name)
             if re_matched:
                 # Create a predicate for the spec
                 spec = FieldSpec(f"{re_matched.group()}{self.op}{self.value}")
@@ -437,6 +883,15 @@ class FieldSpec(object):
         return specs
 
 
+# Comparison functions of typed operators
+_COMPARISONS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
 class FieldPredicate(object):
     """Predicate for log file filtering.
 
@@ -496,6 +951,8 @@ class FieldPredicate(object):
 
     """
 
+    __slots__ = ("name", "dtype", "op", "value", "re_value", "compare")
+
     def __init__(self, name, op="", value=""):
 
         # Set attributes
@@ -507,7 +964,10 @@ class FieldPredicate(object):
         if self.op == "==":
             self.re_value = re.compile(str(self.value), re.I)
 
-        if self.op in ["<", "<=", ">", ">="]:
+        # Comparison function of the operator
+        self.compare = _COMPARISONS.get(self.op)
+
+        if self.compare is not None:
             try:
                 self.value = self.dtype(self.value)
             except:
@@ -539,19 +999,12 @@ class FieldPredicate(object):
                 f"Value '{value}' is not of the dtype '{self.dtype}' of field '{self.name}'"
             )
 
-        match self.op:
-            case "<":
-                return value < self.value
-            case "<=":
-                return value <= self.value
-            case ">":
-                return value > self.value
-            case ">=":
-                return value >= self.value
-            case _:
-                raise ValueError(
-                    f"Unsupported operator '{self.op}' in field predicate '{self.name}{self.op}{self.value}'"
-                )
+        if self.compare is None:
+            raise ValueError(
+                f"Unsupported operator '{self.op}' in field predicate '{self.name}{self.op}{self.value}'"
+            )
+
+        return self.compare(value, self.value)
 
     def __str__(self):
         return f"{self.op}{self.value}"
@@ -561,6 +1014,7 @@ def expand_specs(field_specs):
     """Expand specs to be lists of (name, pred) tuples.
 
     Each spec will be expanded to a list of (name, pred) tuples.
+    Specs which have already been expanded are kept as they are.
 
     Examples
     --------
@@ -572,13 +1026,21 @@ def expand_specs(field_specs):
     >>> [str(x) for x in specs]
     ['JobId', 'JobId', 'JobId==2020.*']
 
+    >>> expand_specs(specs) == specs
+    True
+
     """
 
     specs = []
-    for spec_str in field_specs:
-
-        # Expand field spec name and predicates
-        specs.extend(FieldSpec(spec_str).expanded())
+    for spec in field_specs:
+        if isinstance(spec, FieldSpec):
+            if spec.pred is not None:
+                specs.append(spec)
+            else:
+                specs.extend(spec.expanded())
+        else:
+            # Expand field spec name and predicates
+            specs.extend(FieldSpec(spec).expanded())
 
     return specs
 
@@ -1,11 +1,13 @@
 """H5 data manipulation utilities.
 
 Functions:
+    open_h5(...)
     load_ngroups(...)
     dump_ngroups(...)
     load_xsindices(...)
     dump_xsindices(...)
     load_materials(...)
+    snapshot_materials(...)
     dump_materials(...)
     convert_layout(...)
     fix_materials(...)
@@ -17,10 +19,33 @@ Date:   January 24, 2021
 """
 
 import warnings
+import h5py
 import numpy as np
 from ..material import Material
 
 
+def open_h5(path, mode="r", libver=None, rdcc_nbytes=16*1024*1024, rdcc_nslots=12007):
+    """Open an H5 file with a larger raw data chunk cache.
+
+    Parameters
+    ----------
+    path : path to the H5 file
+    mode : file mode, see h5py.File
+    libver : bounds of the HDF5 library version for object formats. The default
+        keeps files readable by older HDF5; 'latest' enables dense attribute
+        storage which writes attributes faster.
+    rdcc_nbytes : total size of the raw data chunk cache in bytes (16 MiB)
+    rdcc_nslots : number of chunk slots in the cache, preferably a prime number
+
+    Return
+    ------
+    An h5py.File object
+    """
+    return h5py.File(
+        path, mode, libver=libver, rdcc_nbytes=rdcc_nbytes, rdcc_nslots=rdcc_nslots
+        )
+
+
 def iterate_materials(file, layout="named"):
     """Return a generator for iterating materials in a file."""
     ngroups = load_ngroups(file)
@@ -31,6 +56,22 @@ def iterate_materials(file, layout="named"):
         yield material
 
 
+def snapshot_materials(file, layout="named"):
+    """Read all materials in a file into a list.
+
+    The list can be passed to the check functions in place of the file, so that
+    the file is read only once by several checks. See check_sigma_t(...).
+    """
+    return list(iterate_materials(file, layout))
+
+
+def _materials_from(file, layout):
+    """Return materials to be checked from an H5 file or a list of materials."""
+    if isinstance(file, h5py.Group):
+        return iterate_materials(file, layout)
+    return file
+
+
 def load_ngroups(file):
     """Read the number of energy groups from an H5 file.
 
@@ -56,10 +97,19 @@ def load_xsindices(file):
 
     This is for compressed/compact layout.
     Only cross-section names listed in Material.xslist will be searched among
-    the H5 group attributes.
+    the H5 group attributes. The indices are read from the compound attribute
+    'idx_table' if it exists, see dump_xsindices(...).
     """
     materialgroup = file["material"]
     xsindices = {}
+
+    if "idx_table" in materialgroup.attrs:
+        table = materialgroup.attrs["idx_table"]
+        for xsname in Material.xslist:
+            if xsname in table.dtype.names:
+                xsindices[xsname] = table[xsname]
+        return xsindices
+
     for xsname in Material.xslist:
         if f"idx {xsname}" in materialgroup.attrs:
             xsindices[xsname] = materialgroup.attrs[f"idx {xsname}"]
@@ -67,16 +117,26 @@ def load_xsindices(file):
     return xsindices
 
 
-def dump_xsindices(file, xsindices):
+def dump_xsindices(file, xsindices, table=False):
     """Store the XS indices to an H5 file.
 
     This is for compressed/compact layout.
+    By default, each of the indices is written as an attribute named by 'idx'
+    and the cross-section name, which is what antmoc reads. If table is True,
+    all of the indices are written at once as a single compound attribute
+    'idx_table', which can only be read by load_xsindices(...).
     """
     if "material" in file.keys():
         materialgroup = file["material"]
     else:
         materialgroup = file.create_group("material")
 
+    if table:
+        dtype = np.dtype([(xsname, np.int8) for xsname in xsindices])
+        indices = np.array(tuple(xsindices.values()), dtype=dtype)
+        materialgroup.attrs["idx_table"] = indices
+        return
+
     for xsname, xsindex in xsindices.items():
         materialgroup.attrs[f"idx {xsname}"] = np.int8(xsindex)
 
@@ -104,14 +164,14 @@ def load_materials(file, layout="named"):
 
     materials = {}
 
-    for name in h5_top_group:
+    for name, group in h5_top_group.items():
         materials[name] = Material(ngroups=ngroups)
-        materials[name].load(group=h5_top_group[name], layout=layout)
+        materials[name].load(group=group, layout=layout)
 
     return materials
 
 
-def dump_materials(materials, file, layout="named"):
+def dump_materials(materials, file, layout="named", compression=None, dtype=np.float64):
     """Dump all materials to an H5 file object.
 
     Parameters
@@ -119,21 +179,15 @@ def dump_materials(materials, file, layout="named"):
     materials : a dictionary of materials
     file : H5 file object
     layout : data layout, either 'name' or 'compressed'/'compact'
+    compression : compression filter of datasets, e.g. 'gzip' or 'lzf'
+    dtype : floating-point type of datasets (defaults to numpy.float64)
     """
     if not materials:
         warnings.warn("Empty material dictionary", Warning)
         return
 
-    # Check the number of energy groups
     first_key = next(iter(materials))
     ngroups = materials[first_key].ngroups
-    for material in materials.values():
-        if material.ngroups != ngroups:
-            raise ValueError(
-                f"Mismatched number of energy groups:\n"
-                f"# groups in material {first_key} = {ngroups}\n"
-                f"# groups in material {material.name} = {material.ngroups}"
-                )
 
     # Create a top level group as needed
     if "material" in file:
@@ -143,11 +197,30 @@ def dump_materials(materials, file, layout="named"):
 
     dump_ngroups(file, ngroups)
     for material in materials.values():
-        material.dump(parent=h5_top_group, layout=layout)
+        # Check the number of energy groups
+        if material.ngroups != ngroups:
+            raise ValueError(
+                f"Mismatched number of energy groups:\n"
+                f"# groups in material {first_key} = {ngroups}\n"
+                f"# groups in material {material.name} = {material.ngroups}"
+                )
+        material.dump(
+            parent=h5_top_group, layout=layout, compression=compression, dtype=dtype
+            )
+
 
+def convert_layout(inputfile, outputfile, layout="named", compression=None,
+                   dtype=np.float64):
+    """Convert H5 layout from 'named' to 'compact' or vice versa.
 
-def convert_layout(inputfile, outputfile, layout="named"):
-    """Convert H5 layout from 'named' to 'compact' or vice versa."""
+    Parameters
+    ----------
+    inputfile : H5 file object for reading materials
+    outputfile : H5 file object for storing converted materials
+    layout : data layout of the input file, either 'name' or 'compressed'/'compact'
+    compression : compression filter of datasets, e.g. 'gzip' or 'lzf'
+    dtype : floating-point type of datasets (defaults to numpy.float64)
+    """
     # Read and write the number of energy groups
     ngroups = load_ngroups(inputfile)
     dump_ngroups(outputfile, ngroups)
@@ -165,12 +238,15 @@ def convert_layout(inputfile, outputfile, layout="named"):
     else:
         raise ValueError(f"Undefined H5 file layout {layout}")
 
-    materials = iterate_materials(inputfile, layout)
-    for material in materials:
-        material.dump(parent=outgroup, layout=outlayout)
+    # Materials are converted one by one
+    for material in iterate_materials(inputfile, layout):
+        material.dump(
+            parent=outgroup, layout=outlayout, compression=compression, dtype=dtype
+            )
 
 
-def fix_materials(inputfile, outputfile, xs="sigma_s", layout="named"):
+def fix_materials(inputfile, outputfile, xs="sigma_s", layout="named", compression=None,
+                  dtype=np.float64):
     """Fix the scatter matrix for all materials.
 
     Parameters
@@ -180,6 +256,8 @@ def fix_materials(inputfile, outputfile, xs="sigma_s", layout="named"):
     layout : data layout, either 'name' or 'compressed'/'compact'
     xs : string indicating which array to be fixed
         sigma_s, sigma_t
+    compression : compression filter of datasets, e.g. 'gzip' or 'lzf'
+    dtype : floating-point type of datasets (defaults to numpy.float64)
     """
     if xs.lower() not in ["sigma_s", "sigma_t"]:
         raise ValueError(f"No such routine to fix '{xs}'")
@@ -198,7 +276,9 @@ def fix_materials(inputfile, outputfile, xs="sigma_s", layout="named"):
         elif xs.lower() == "sigma_t":
             material.fix_sigma_total()
 
-        material.dump(parent=out_top_group, layout=layout)
+        material.dump(
+            parent=out_top_group, layout=layout, compression=compression, dtype=dtype
+            )
 
 
 def check_sigma_t(file, layout="named", tolerance=1e-15):
@@ -209,7 +289,7 @@ def check_sigma_t(file, layout="named", tolerance=1e-15):
 
     Parameters
     ----------
-    file : an H5 file object
+    file : an H5 file object, or a list of materials (see snapshot_materials)
     layout : material data layout type
     tolerance : tolerance for floating-point comparison
 
@@ -217,7 +297,7 @@ def check_sigma_t(file, layout="named", tolerance=1e-15):
     ------
     True if a sigma_t exists and is good, False otherwise
     """
-    materials = iterate_materials(file, layout)
+    materials = _materials_from(file, layout)
 
     xsnames = ["total", "transport"]
     missing_sigma_t = []
@@ -225,30 +305,33 @@ def check_sigma_t(file, layout="named", tolerance=1e-15):
 
     for material in materials:
         ngroups = material.ngroups
-        expected = material.build_sigma_total()
-
         if all(xs not in material.keys() for xs in xsnames):
             # Check whether the material have a sigma_t
             missing_sigma_t.append(material.name)
             continue
 
+        # Build the expected values only for materials having a sigma_t
+        expected = material.build_sigma_total()
+
         results = {}
         for xs in xsnames:
             if xs in material.keys():
-                # Compare each of the values
-                result = [
-                    (i + 1, f"{material[xs][i]:.5E}", f"{expected[i]:.5E}")
-                    for i in range(ngroups) if material[xs][i] < expected[i] - 1e-13
-                    ]
-                # If there are any negative values, keep it for reporting
-                if result:
-                    results[xs] = result
+                # Compare all of the values at once and format the bad ones
+                actual = material[xs][:ngroups]
+                bad = np.flatnonzero(actual < expected[:ngroups] - 1e-13)
+                # If there are any bad values, keep them for reporting
+                if bad.size > 0:
+                    results[xs] = (actual, expected, bad)
 
         if results:
             is_good = False
             print(f"Total XS smaller than expected found in material {material.name}.\n"
                   "Results are formatted to (group, actual, expected).")
-            for xs, array in results.items():
+            for xs, (actual, expected, bad) in results.items():
+                array = [
+                    (int(i) + 1, f"{actual[i]:.5E}", f"{expected[i]:.5E}")
+                    for i in bad
+                    ]
                 print(f"In array '{xs}':\n{array}")
             print()
 
@@ -262,11 +345,16 @@ def check_sigma_t(file, layout="named", tolerance=1e-15):
 def check_negative_xs(file, layout="named"):
     """Check negative values in xs data file.
 
+    Parameters
+    ----------
+    file : an H5 file object, or a list of materials (see snapshot_materials)
+    layout : material data layout type
+
     Return
     ------
     True if there is no negative value, False otherwise.
     """
-    materials = iterate_materials(file, layout)
+    materials = _materials_from(file, layout)
     is_good = True
 
     for material in materials:
@@ -275,26 +363,28 @@ def check_negative_xs(file, layout="named"):
         for xs, array in material.items():
             # Find negative values in the scatter matrix
             if xs.find("scatter") < 0:
-                result = [
-                    (i+1, f"{array[i]:.5E}")
-                    for i in range(ngroups) if array[i] < .0
-                    ]
+                bad = np.flatnonzero(array[:ngroups] < .0)
             else:
-                result = [
-                    (i // ngroups + 1, i % ngroups + 1, f"{array[i]:.5E}")
-                    for i in range(ngroups * ngroups) if array[i] < .0
-                    ]
-            # If there are any negative values, keep it for reporting
-            if result:
-                results[xs] = result
+                bad = np.flatnonzero(array[:ngroups * ngroups] < .0)
+            # If there are any negative values, keep them for reporting
+            if bad.size > 0:
+                results[xs] = (array, bad)
 
         if results:
             is_good = False
             print(f"Negative values found in material {material.name}.\n"
                   "Results for the scatter are formatted to (group, group, value).\n"
                   "Results for the rest are formatted to (group, value).")
-            for xs, array in results.items():
-                print(f"In array '{xs}':\n{array}")
+            # Values are formatted only when they are reported
+            for xs, (array, bad) in results.items():
+                if xs.find("scatter") < 0:
+                    result = [(int(i) + 1, f"{array[i]:.5E}") for i in bad]
+                else:
+                    result = [
+                        (int(i) // ngroups + 1, int(i) % ngroups + 1, f"{array[i]:.5E}")
+                        for i in bad
+                        ]
+                print(f"In array '{xs}':\n{result}")
             print()
 
     return is_good
@@ -1,7 +1,10 @@
 """Functions to manipulate materials.xml
 
 Functions:
+    parse_xml(...)
     find_materials(...)
+    iter_materials(...)
+    stream_materials(...)
     reset_all_densities(...)
     reset_nuclideset_ids(...)
     replace_nuclide_ids(...)
@@ -14,6 +17,25 @@ Date:   January 22, 2021
 import warnings
 from ..materialxml import MaterialXML
 
+try:
+    # lxml is recommended for large XML files, it parses and iterates in C
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+
+def parse_xml(source):
+    """Parse an XML file into an element tree.
+
+    The tree is built by lxml if it is available, or by xml.etree.ElementTree
+    otherwise. Both of them can be passed to the functions in this module.
+
+    Parameters
+    ----------
+    source : name of an XML file or a file object.
+    """
+    return ET.parse(source)
+
 
 def find_materials(xmltree):
     """Read materials from an XML tree.
@@ -67,14 +89,115 @@ def find_materials(xmltree):
     return materials
 
 
+def iter_materials(source):
+    """Read materials from an XML file one by one.
+
+    Unlike find_materials(...), the file is parsed incrementally and each material
+    node is cleared once it has been read, so the whole tree is never kept in
+    memory.
+
+    Parameters
+    ----------
+    source : name of an XML file or a file object.
+
+    Return
+    ------
+    A generator of material objects.
+    """
+    root = None
+    ngroups = 0
+    depth = 0
+
+    for event, node in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if root is None:
+                root = node
+                # Check if the number of groups is specified
+                if "groups" in root.attrib:
+                    ngroups = int(root.get("groups"))
+            continue
+
+        depth -= 1
+        # Only materials right under the root are read, see find_materials(...)
+        if depth == 1 and node.tag == "material":
+            material = MaterialXML(node=node)
+            material.ngroups = ngroups
+            yield material
+
+            # Release the nodes already read
+            root.clear()
+
+
+def stream_materials(source, output, function):
+    """Rewrite materials in an XML file one by one.
+
+    The file is parsed incrementally and each material node right under the root
+    is passed to function(node), which modifies it in place. Nodes are written to
+    the output file as soon as they have been modified and then released, so the
+    whole tree is never kept in memory.
+
+    Parameters
+    ----------
+    source : name of an XML file or a file object.
+    output : name of the output XML file.
+    function : a callable taking a material node, e.g. reset_density(...).
+
+    Examples
+    --------
+        stream_materials("materials.xml", "materials-new.xml", reset_density)
+    """
+    root = None
+    depth = 0
+    # A node is written after the next one is read because its tail is unknown
+    # until then
+    pending = None
+
+    with open(output, "wb") as file:
+        for event, node in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if root is None:
+                    root = node
+                continue
+
+            depth -= 1
+            if depth == 1:
+                if pending is None:
+                    # Write the start tag of the root along with its text
+                    shell = ET.Element(root.tag, dict(root.attrib))
+                    shell.text = (root.text or "") + "_"
+                    head = ET.tostring(shell)
+                    file.write(head[:head.rindex(b"_</")])
+                else:
+                    file.write(ET.tostring(pending))
+                    root.remove(pending)
+
+                if node.tag == "material":
+                    function(node)
+                pending = node
+            elif depth == 0:
+                if pending is None:
+                    file.write(ET.tostring(root))
+                else:
+                    file.write(ET.tostring(pending))
+                    root.remove(pending)
+                    file.write(f"</{root.tag}>".encode())
+
+
+def reset_density(node):
+    """Compute the density of a material node by summing up density weights."""
+    material = MaterialXML(node=node, nocheck=True)
+    material.compute_density()
+    node.set("density", f"{material.density:.6e}")
+
+
 def reset_all_densities(xmltree):
     """Read materials and compute densities by summing up density weights."""
     # Loop over materials and reset the density for each of them
     root = xmltree.getroot()
     for node in root.iter("material"):
-        material = MaterialXML(node=node, nocheck=True)
-        material.compute_density()
-        node.set("density", f"{material.density:.6e}")
+        reset_density(node)
 
     return xmltree
 
@@ -89,6 +212,7 @@ def replace_nuclide_ids(xmltree, idmap):
     idmap : a dictionary
     """
     idmap = {str(key): str(value) for key, value in idmap.items()}
+    newids = set(idmap.values())
     root = xmltree.getroot()
 
     unchanged_ids = set()
@@ -97,9 +221,10 @@ def replace_nuclide_ids(xmltree, idmap):
     for node in root.iter("material"):
         for nuclide in node.iter("nuclide"):
             nuclideid = nuclide.get("id")
-            if nuclideid in idmap:
-                nuclide.set("id", idmap[nuclideid])
-            elif nuclideid in idmap.values():
+            newid = idmap.get(nuclideid)
+            if newid is not None:
+                nuclide.set("id", newid)
+            elif nuclideid in newids:
                 # If the id is not a key but is a value in the dictionary, skip it
                 unchanged_ids.add(nuclideid)
             else:
@@ -137,8 +262,9 @@ def reset_nuclideset_ids(xmltree, idmap):
     root = xmltree.getroot()
     for node in root.iter("material"):
         name = node.get("name")
-        if name in idmap:
-            node.set("set", idmap[name])
+        newid = idmap.get(name)
+        if newid is not None:
+            node.set("set", newid)
             reset_names.add(name)
         else:
             unchanged_names.add(name)
@@ -157,24 +283,29 @@ def reset_nuclideset_ids(xmltree, idmap):
     return xmltree
 
 
+def add_nuclide_id_suffix(node):
+    """Add the nuclide set id of a material node as suffixes to nuclide ids."""
+    # Look for an valid set id
+    for attr in ["set", "name"]:
+        setid = node.get(attr)
+        if setid:
+            break
+    setid = int(setid)
+
+    # Check the length of the set id
+    if setid // 100 != 0:
+        warnings.warn(f"Nuclide set id {setid} may be too long")
+
+    # Append the set id to the nuclide id, the suffix is formatted only once
+    suffix = f"{setid:02}"
+    for nuclide in node.iter("nuclide"):
+        nuclide.set("id", f"{nuclide.get('id')}{suffix}")
+
+
 def add_nuclide_id_suffixes(xmltree):
     """Add nuclide set id as suffixes to nuclide ids."""
     root = xmltree.getroot()
     for node in root.iter("material"):
-        # Look for an valid set id
-        for attr in ["set", "name"]:
-            setid = node.get(attr)
-            if setid:
-                break
-        setid = int(setid)
-
-        # Check the length of the set id
-        if setid // 100 != 0:
-            warnings.warn(f"Nuclide set id {setid} may be too long")
-
-        # Append the set id to the nuclide id
-        for nuclide in node.iter("nuclide"):
-            nuclideid = nuclide.get("id")
-            nuclide.set("id", f"{nuclideid}{setid:02}")
+        add_nuclide_id_suffix(node)
 
     return xmltree
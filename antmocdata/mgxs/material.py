@@ -4,11 +4,32 @@ Author: An Wang, USTB (wangan.cs@gmail.com)
 Date:   October 4, 2020
 """
 
-import copy
 import warnings
 import numpy as np
 
 
+def _read_float64(dataset):
+    """Read a whole H5 dataset into a new float64 array.
+    The data is converted by HDF5 while it is read, which saves the extra copy
+    made by np.array(dataset, dtype=np.float64).
+    """
+    array = np.empty(dataset.shape, dtype=np.float64)
+    if array.size > 0:
+        dataset.read_direct(array)
+    return array
+
+
+def _dataset_options(compression=None, dtype=np.float64):
+    """Return keyword arguments of create_dataset for a data type and a compression
+    filter. Byte shuffling is enabled along with the compression, which usually
+    improves the compression ratio of floating-point arrays.
+    """
+    options = {"dtype": dtype}
+    if compression:
+        options.update(compression=compression, shuffle=True)
+    return options
+
+
 class Material:
     """The representation for Material used as antmoc input.
 
@@ -55,6 +76,7 @@ class Material:
         "chi",
         "scatter matrix",
     ]
+    _xsset = frozenset(xslist)
 
     # An index map for compressed layout.
     # These indices are to be written to the H5 file as top-level attributes.
@@ -90,7 +112,7 @@ class Material:
         return self.data[xsname]
 
     def __setitem__(self, xsname, value):
-        if xsname not in Material.xslist:
+        if xsname not in Material._xsset:
             raise KeyError(f"Undefined cross-section name: {xsname}")
         self.data[xsname] = value
 
@@ -99,16 +121,21 @@ class Material:
         Two materials are considered equal if they have the same name, number of
         energy groups, and cross-sections.
         """
+        if self is other:
+            return True
+
         if isinstance(other, Material):
             is_equal = self.name == other.name \
                 and self.ngroups == other.ngroups \
-                and len(self.data) == len(other.data)
+                and self.data.keys() == other.data.keys()
 
             if not is_equal:
                 return False
 
-            for xsname in self.data:
-                if not np.array_equal(self.data[xsname], other.data[xsname]):
+            # Arrays of different shapes are rejected by np.array_equal without
+            # comparing any element
+            for xsname, array in self.data.items():
+                if not np.array_equal(array, other.data[xsname]):
                     return False
 
             return True
@@ -144,20 +171,24 @@ class Material:
             name=self.name,
             info=self.info,
             ngroups=self.ngroups,
-            data=copy.deepcopy(self.data)
+            data={xsname: array.copy() for xsname, array in self.data.items()}
             )
 
     def scatter_matrix(self, order=0):
-        """Return the scatter matrix of a specified order."""
-        if self['scatter matrix'].ndim > 1:
-            return self['scatter matrix'][order, :]
-        return self['scatter matrix']
+        """Return the scatter matrix of a specified order.
+
+        The matrix is a (ngroups, ngroups) view of the stored array, in which each
+        row holds a single energy group.
+        """
+        ngroups = self.ngroups
+        return self['scatter matrix'].reshape(-1, ngroups, ngroups)[order]
 
     def _check_xs_size(self):
         """Check sizes of each array."""
         for xsname, array in self.items():
             if xsname.find("scatter") >= 0:
-                array = array.flatten()
+                # Flatten without copying the data
+                array = np.ravel(array)
                 squaregroups = self.ngroups * self.ngroups
                 if len(array) % (squaregroups) != 0:
                     raise ValueError(
@@ -168,7 +199,7 @@ class Material:
                     f"Array '{xsname}' has length {len(array)} which not "
                     f"equals ngroups ({self.ngroups})")
 
-    def dump(self, parent, layout="named"):
+    def dump(self, parent, layout="named", compression=None, dtype=np.float64):
         """Dump the material to an H5 group
 
         The material will be written to the file as a subgroup named by the
@@ -180,21 +211,28 @@ class Material:
             the parent group of materials, which is often set to '/material'.
         layout : string
             material data layout, either 'named' or 'compressed'/'compact'.
+        compression : string
+            compression filter of datasets, e.g. 'gzip' or 'lzf' (defaults to None).
+        dtype : data type
+            floating-point type of datasets (defaults to numpy.float64). Arrays are
+            converted as they are written.
         """
         # Check array sizes
         self._check_xs_size()
 
+        options = _dataset_options(compression, dtype)
+
         layout_upper = layout.upper()
         if layout_upper in ["NAMED", "OPENMOC"]:
-            self._dump_h5_named(parent)
+            self._dump_h5_named(parent, **options)
         elif layout_upper in ["COMPRESSED", "COMPACT"]:
-            self._dump_h5_compact(parent)
+            self._dump_h5_compact(parent, **options)
         else:
             raise ValueError(f"Undefined material data file layout: {layout}")
 
         self._dump_h5_attributes(parent)
 
-    def _dump_h5_named(self, parent):
+    def _dump_h5_named(self, parent, **kwargs):
         """Dump the material with layout 'named'."""
 
         # Set default cross-section values
@@ -208,25 +246,28 @@ class Material:
 
         # Dump cross-sections to the file
         for xsname, array in self.items():
-            h5group.create_dataset(xsname, data=array.flatten(), dtype=np.float64)
+            h5group.create_dataset(
+                xsname, data=np.ravel(array), **kwargs
+                )
 
-    def _dump_h5_compact(self, parent):
+    def _dump_h5_compact(self, parent, **kwargs):
         """Dump the material with layout 'compressed'/'compact'."""
         # Create a subgroup for the material
         h5group = parent.create_group(str(self.name))
 
         columns = int(max(Material.xsindices.values())) + 1
 
-        # Build the 'reactions' dataset and dump it into the file
+        # Build the 'reactions' dataset and dump it into the file. Columns follow
+        # the current Material.xsindices, which may be reset by convert_layout.
         reactions = np.zeros(shape=(self.ngroups, columns), dtype=np.float64)
         for xsname, xsindex in Material.xsindices.items():
             reactions[:, xsindex] = self[xsname]
 
-        h5group.create_dataset('reactions', data=reactions, dtype=np.float64)
+        h5group.create_dataset('reactions', data=reactions, **kwargs)
 
         # Reshape the scatter matrix and dump it into the file
         scatter = np.reshape(self['scatter matrix'], (self.ngroups, self.ngroups))
-        h5group.create_dataset('scattering', data=scatter, dtype=np.float64)
+        h5group.create_dataset('scattering', data=scatter, **kwargs)
 
     def _dump_h5_attributes(self, parent):
         """Define additional H5 attributes for the material.
@@ -271,9 +312,27 @@ class Material:
 
     def _load_h5_named(self, group):
         """Load the material with layout 'named'."""
-        for xsname in Material.xslist:
-            if xsname in group:
-                self[xsname] = np.array(group[xsname], dtype=np.float64)
+        # List the datasets once instead of looking up every XS name
+        names = set(group)
+        datasets = {
+            xsname: group[xsname] for xsname in Material.xslist if xsname in names
+            }
+
+        # Arrays of length ngroups are packed into the rows of a single block
+        vectors = [
+            xsname for xsname, dataset in datasets.items()
+            if dataset.shape == (self.ngroups,) and xsname.find("scatter") < 0
+            ]
+        packed = np.empty((len(vectors), self.ngroups), dtype=np.float64)
+        rows = dict(zip(vectors, packed))
+
+        for xsname, dataset in datasets.items():
+            if xsname in rows:
+                if self.ngroups > 0:
+                    dataset.read_direct(rows[xsname])
+                self[xsname] = rows[xsname]
+            else:
+                self[xsname] = _read_float64(dataset)
 
     def _load_h5_compact(self, group):
         """Load the material with layout 'compressed'/'compact'."""
@@ -288,8 +347,11 @@ class Material:
                 f"Failed to read dataset '{dataset.name}' from a 'compact' H5 file:\n"
                 f"Bad dataset shape {dataset.shape}")
 
+        # Read the whole dataset at once rather than column by column. The transpose
+        # keeps all of the arrays packed in a single block, one array per row.
+        packed = _read_float64(dataset).T.copy()
         for xsname, xsindex in Material.xsindices.items():
-            self[xsname] = np.array(dataset[:, xsindex], dtype=np.float64)
+            self[xsname] = packed[xsindex]
 
         # Read dataset 'scattering'
         dataset = group['scattering']
@@ -299,7 +361,7 @@ class Material:
                 f"Failed to read dataset '{dataset.name}' from a 'compact' H5 file:\n"
                 f"Bad dataset shape {dataset.shape}")
 
-        self["scatter matrix"] = np.array(dataset[...], dtype=np.float64).flatten()
+        self["scatter matrix"] = _read_float64(dataset).reshape(-1)
 
     def _load_h5_attributes(self, group):
         """Read additional H5 attributes for the material."""
@@ -308,17 +370,11 @@ class Material:
 
     def build_sigma_total(self):
         """Return the sum of 'absorption' and 'scatter'."""
-        # Select the first row of the scatter data (0th order)
+        # Select the scatter matrix of the 0th order
         scatter = self.scatter_matrix(0)
 
         # Add 'scatter' to array 'absorption'
-        sigma_total = self["absorption"].copy()
-        for group in range(self.ngroups):
-            # Starting and end positions of a single energy group
-            start = group * self.ngroups
-            end = start + self.ngroups
-            sigma_total[group] += np.sum(scatter[start:end])
-        return sigma_total
+        return self["absorption"] + scatter.sum(axis=1)
 
     def fix_scatter_matrix(self):
         """Add 'transport' - 'total' to the diagonal elements of the scatter matrix.
@@ -331,13 +387,9 @@ class Material:
         # Build the array of sigma total, substract it from 'transport'
         delta = self["transport"] - self.build_sigma_total()
 
-        # Add ('transport' - 'total') to the scatter matrix
-        for group in range(self.ngroups):
-            # Starting and end positions of a single energy group
-            start = group * self.ngroups
-
-            # Add the delta to diagonal elements
-            self["scatter matrix"][start+group] += delta[group]
+        # Add ('transport' - 'total') to diagonal elements of the scatter matrix
+        scatter = self.scatter_matrix(0)
+        scatter[np.diag_indices_from(scatter)] += delta
 
     def fix_sigma_total(self):
         """Take the sum of 'absorption' and 'scatter' as 'total'."""
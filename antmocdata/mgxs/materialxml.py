@@ -9,6 +9,9 @@ import numpy as np
 import re
 from .material import Material
 
+# Patterns like '1.000-1' or '1.000E-1'
+_FLOAT_RE = re.compile(r"([\+-]?[0-9]\.[0-9]+)[e]?([\+-][0-9]+)", re.I)
+
 
 class MaterialXML(Material):
     """Material associated with a node in `materials.xml`.
@@ -26,39 +29,29 @@ class MaterialXML(Material):
         """
         super().__init__()
 
+        # Optional attributes are read with defaults in a single lookup each
+        attrib = node.attrib
+
         # Unique name
-        self.name = node.get("name")
+        self.name = attrib.get("name")
 
         # Description (optional)
-        if "label" in node.attrib:
-            self.info = node.get("label")
-        else:
-            self.info = ""
+        self.info = attrib.get("label", "")
 
         # ID of the associated nuclide set
-        if "set" in node.attrib:
-            self.setid = node.get("set")
-        else:
-            self.setid = self.name
+        self.setid = attrib.get("set", self.name)
 
         # Total density (optional)
-        if "density" in node.attrib:
-            self.density = node.get("density")
-        else:
-            self.density = 0.
+        self.density = attrib.get("density", 0.)
 
         # Temperature (optional)
-        if "temperature" in node.attrib:
-            self.temperature = node.get("temperature")
-        else:
-            self.temperature = "0K"
+        self.temperature = attrib.get("temperature", "0K")
 
         # Weights of nuclides (nuclide ID -> density)
-        self.weights = {}
-        for subnode in node.findall("nuclide"):
-            nuclideid = subnode.get("id")
-            nuclideweight = subnode.get("radio")
-            self.weights[nuclideid] = nuclideweight
+        self.weights = {
+            subnode.get("id"): subnode.get("radio")
+            for subnode in node.iterfind("nuclide")
+            }
 
         # Macroscopic cross-sections (optional)
         macronode = node.find("macroscopic")
@@ -66,7 +59,7 @@ class MaterialXML(Material):
             self.data = {}
             for xsnode in macronode:
                 x = np.fromstring(xsnode.text, dtype=np.float64, sep=' ')
-                if xsnode.tag in Material.xslist:
+                if xsnode.tag in Material._xsset:
                     self[xsnode.tag] = x
                 if xsnode.tag == "scattering":
                     self["scatter matrix"] = x
@@ -97,8 +90,11 @@ class MaterialXML(Material):
 
     def _fix_float(self, string):
         """Check and fix a floating-point number in a string."""
-        # Search for patterns like '1.000-1' or '1.000E-1'
-        re_matched = re.match(r"([\+-]?[0-9]\.[0-9]+)[e]?([\+-][0-9]+)", string, re.I)
+        # Numbers with an exponent mark are well-formed already
+        if "e" in string or "E" in string:
+            return string
+        # Search for patterns like '1.000-1'
+        re_matched = _FLOAT_RE.match(string)
         if re_matched:
             string = "{}E{}".format(re_matched.group(1), re_matched.group(2))
         return string
@@ -116,11 +112,12 @@ class MaterialXML(Material):
         nuclideid : uid of a nuclide (int)
         weight : density weight of a nuclide (float)
         """
+        # Compare against powers of 10 rather than taking logarithms
         real_id = int(nuclideid)
-        if math.log10(real_id) > 4:
+        if real_id > 10000:
             real_id = real_id // 100
 
-        if math.log10(real_id) < 3:
+        if real_id < 1000:
             raise ValueError(
                 f"Failed to add density weight for material {self.name}:\n"
                 f"Nuclide UID {nuclideid} was parsed to be {real_id}, which is invalid."
@@ -131,8 +128,12 @@ class MaterialXML(Material):
 
     def compute_density(self):
         """Sum up all density weights."""
-        weights = [float(self._fix_float(w)) for w in self.weights.values()]
-        self.density = sum(weights)
+        # Weights are strings unless they have been checked by check_and_fix()
+        weights = [
+            float(self._fix_float(w)) if isinstance(w, str) else w
+            for w in self.weights.values()
+            ]
+        self.density = math.fsum(weights)
 
     def __str__(self):
         string = "MaterialXML:\n" \
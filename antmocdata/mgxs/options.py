@@ -54,6 +54,12 @@ class Options(BaseOptions):
                  doc="output filename")
         self.add(name="layout", default="named",
                  doc="data layout in the H5 file ('named' or 'compact')")
+        self.add(name="compression", default=None,
+                 doc="compression filter of H5 datasets ('gzip' or 'lzf')")
+        self.add(name="precision", default="float64",
+                 doc="floating-point type of H5 datasets ('float64' or 'float32')")
+        self.add(name="cache-bytes", default=16*1024*1024, dtype=int,
+                 doc="size of the raw data chunk cache for H5 files in bytes")
 
 
 if __name__ == "__main__":
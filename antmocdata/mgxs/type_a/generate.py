@@ -9,19 +9,27 @@ Author: An Wang, USTB (wangan.cs@gmail.com)
 Date:   January 22, 2021
 """
 
+import multiprocessing
 import warnings
-import h5py
 import numpy as np
+from ..manip.h5 import open_h5
 from .material import MaterialTypeA
 
 
-def setup_materials(xmltree, nuclidesets):
+def _compute_xs(material, nuclideset):
+    """Compute cross-sections for a material, this is run by worker processes."""
+    material.compute_xs(nuclideset)
+    return material
+
+
+def setup_materials(xmltree, nuclidesets, nprocs=1):
     """Read material definitions from an XML tree and compute cross-sections for them.
 
     Parameters
     ----------
     xmltree : XML element tree.
     nuclidesets : a dictionary of NuclideSet object indexed by set id.
+    nprocs : number of processes for computing cross-sections (defaults to 1).
 
     Return
     ------
@@ -30,6 +38,9 @@ def setup_materials(xmltree, nuclidesets):
     root = xmltree.getroot()
     materials = {}
 
+    # Materials to be computed, each of which is paired with its nuclide set
+    tasks = []
+
     # Loop over materials
     for node in root.findall("material"):
         # Instantiate a material
@@ -44,23 +55,40 @@ def setup_materials(xmltree, nuclidesets):
                 )
             continue
 
-        material.compute_xs(nuclidesets[material.setid])
+        tasks.append((material, nuclidesets[material.setid]))
+
+    if nprocs > 1 and len(tasks) > 1:
+        # Materials are independent, only the needed nuclide set is sent to
+        # a worker along with each material
+        chunksize = max(1, len(tasks) // (4 * nprocs))
+        with multiprocessing.Pool(processes=nprocs) as pool:
+            computed = pool.starmap(_compute_xs, tasks, chunksize=chunksize)
+        for material in computed:
+            materials[material.name] = material
+    else:
+        for material, nuclideset in tasks:
+            material.compute_xs(nuclideset)
 
     return materials
 
 
-def generate_mgxs_h5(file, xmltree, nuclidesets, fixscatter=False):
+def generate_mgxs_h5(file, xmltree, nuclidesets, fixscatter=False, nprocs=1, libver=None,
+                     compression=None, dtype=np.float64):
     """Read materials, compute cross-sections for them, and dump them to an H5 file.
 
     Parameters
     ----------
     See function setup_materials(...)
+    libver : bounds of the HDF5 library version, see open_h5(...)
+    compression : compression filter of datasets, e.g. 'gzip' or 'lzf'
+    dtype : floating-point type of datasets, cross-sections are computed in float64
+        anyway (defaults to numpy.float64)
     """
     # Generate materials.
-    materials = setup_materials(xmltree, nuclidesets)
+    materials = setup_materials(xmltree, nuclidesets, nprocs=nprocs)
 
     # Dump materials to an H5 file.
-    with h5py.File(file, "w") as h5_file:
+    with open_h5(file, "w", libver=libver) as h5_file:
         # Create the top-level group.
         h5_top = h5_file.create_group("material")
 
@@ -72,7 +100,7 @@ def generate_mgxs_h5(file, xmltree, nuclidesets, fixscatter=False):
             if fixscatter:
                 material.fix_scatter_matrix()
 
-            material.dump(h5_top)
+            material.dump(h5_top, compression=compression, dtype=dtype)
 
         # Write the number of groups to the file as an top-level attribute.
         h5_file.attrs["# groups"] = np.int64(ngroups)
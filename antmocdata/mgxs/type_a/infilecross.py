@@ -7,12 +7,14 @@ Functions:
     parse_xs_arrays(...)
     parse_scatter_matrix(...)
     parse_nuclideset(...)
+    load_infilecross(...)
     find_nuclidesets(...)
 
 Author: An Wang, USTB (wangan.cs@gmail.com)
 Date:   November 17, 2020
 """
 
+import functools
 import json
 import pathlib
 import re
@@ -21,12 +23,35 @@ import numpy as np
 from . import nuclides
 
 
+# Patterns for extracting the name and mass of a nuclide. Files are plain
+# ASCII, so case folding is restricted to ASCII letters.
+_NAME_PATTERNS = [
+    re.compile(r"[^a-z\.]*([a-z]+)-([0-9]+)[ \t]*", re.I | re.A),
+    re.compile(r"[^a-z\.]*([a-z]+)([0-9]+)[^0-9]*[ \t]*", re.I | re.A),
+]
+
+# Patterns for extracting the nuclide set ID
+_SETID_PATTERNS = [
+    re.compile(r'[ \t]*\$.*SET([0-9]+)[ \t]*$', re.I | re.A),
+    re.compile(r'[ \t]*\$.*([0-9]+)SET[ \t]*$', re.I | re.A),
+]
+
+# Each of the nuclide set sections starts with a line marked by "$"
+_SET_START = re.compile(r"[ \t]*\$.*")
+
+# The default elements map
+_DEFAULT_ELEMENT_MAP = str(pathlib.Path(__file__).parent.absolute() / "elements.json")
+
+
+@functools.lru_cache(maxsize=None)
 def read_element_map(jsonfile):
     """Read element definitions from a json file.
 
     This function generate a dictionary which maps element names to numbers.
     Each of the value is an array of integers, which contains the element
     number and an optional mass number.
+    Maps are cached by file name, so the returned dictionary should not be
+    modified.
 
     Parameters
     ----------
@@ -55,7 +80,8 @@ def parse_nuclide_name(string, elementmap=None):
     Parameters
     ----------
     string : element name in string.
-    elementmap : file containing an elements map (defaults to "elements.json")
+    elementmap : file containing an elements map (defaults to "elements.json"), or
+        a dictionary returned by read_element_map(...)
 
     Return
     ------
@@ -81,32 +107,39 @@ def parse_nuclide_name(string, elementmap=None):
     >>> print(Cr_50)
     ('CHROMIUM', 24, 50)
 
+    """
+    if not elementmap:
+        elementmap = _DEFAULT_ELEMENT_MAP
+    if isinstance(elementmap, dict):
+        return _match_nuclide_name(string, elementmap, "the elements map")
+    return _parse_nuclide_name_cached(string, str(elementmap))
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_nuclide_name_cached(string, elementmap):
+    """Parse a name with an elements map given by file name.
+    Results are cached since the same nuclides appear in many sets.
     """
     # Initialize the elements map as needed.
     #   element name -> [number] or [number, mass]
-    if not elementmap:
-        path = pathlib.Path(__file__).parent.absolute() / "elements.json"
-        elementmap = str(path)
-    elementmap = read_element_map(elementmap)
-
-    # Patterns for extracting the name and mass
-    name_patterns = [
-        r"[^a-z\.]*([a-z]+)-([0-9]+)[ \t]*",
-        r"[^a-z\.]*([a-z]+)([0-9]+)[^0-9]*[ \t]*"
-    ]
-
-    # Parse the name for the atomic number and mass.
-    for pattern in name_patterns:
-        re_matched = re.match(pattern, string, re.I)
+    elements = read_element_map(elementmap)
+
+    return _match_nuclide_name(string, elements, f"file '{elementmap}'")
+
+
+def _match_nuclide_name(string, elements, source):
+    """Parse a name for the atomic number and mass with an elements map."""
+    for pattern in _NAME_PATTERNS:
+        re_matched = pattern.match(string)
         if re_matched:
             name = re_matched.group(1).upper()
             mass = re_matched.group(2)
 
-            if name in elementmap:
-                number = elementmap[name][0]
+            if name in elements:
+                number = elements[name][0]
             else:
                 raise KeyError(
-                    f"When parsing '{string}': failed to find '{name}' in file '{elementmap}'"
+                    f"When parsing '{string}': failed to find '{name}' in {source}"
                     )
             break
 
@@ -133,22 +166,20 @@ def parse_nuclideset_id(string):
     >>> parse_nuclideset_id("$Some string 1 7SETs SET2")
     2
     """
-    patterns = [
-        r'[ \t]*\$.*SET([0-9]+)[ \t]*$',
-        r'[ \t]*\$.*([0-9]+)SET[ \t]*$',
-    ]
-
-    for pattern in patterns:
-        re_matched = re.search(pattern, string, re.I)
-        if re_matched:
-            break
+    re_matched = None
+    # Both patterns require a '$', which is cheaper to look for than to search
+    if "$" in string:
+        for pattern in _SETID_PATTERNS:
+            re_matched = pattern.search(string)
+            if re_matched:
+                break
 
     if not re_matched:
         raise ValueError(
             f"Failed to find the number of sets in the following string:\n"
             f"\n{string.encode('unicode_escape')}\n\n"
             f"Patterns searched:\n"
-            "{}".format('\n'.join(patterns))
+            "{}".format('\n'.join(x.pattern for x in _SETID_PATTERNS))
             )
 
     return int(re_matched.group(1))
@@ -192,7 +223,7 @@ def parse_count_nuclides_groups(string):
 
 def parse_chi(string):
     """Parse a string for Chi."""
-    chi = [np.float64(word) for word in string.strip().split()]
+    chi = np.array(string.split(), dtype=np.float64)
 
     if len(chi) == 0:
         raise ValueError("Failed to parse an empty string for Chi")
@@ -216,7 +247,7 @@ def parse_xs_arrays(strings, xsindices=None):
             "nu": 3
         }
 
-    The function returns a dictionary as follow
+    The function returns a dictionary of numpy arrays as follow
         {
             "absorption": [0.1505E-02, 0.2867E-03],
             "fission": [0.6758E-05, 0],
@@ -245,32 +276,34 @@ def parse_xs_arrays(strings, xsindices=None):
     # Find the maximum column index
     n_columns_required = max(xsindices.values()) + 1
 
-    # Initialize the result dictionary
-    xs_data = {}
-    for xs_name in xsindices:
-        xs_data[xs_name] = []
-
+    rows = []
     for string in strings:
-        array = [np.float64(word) for word in string.strip().split()]
+        words = string.split()
 
         # Check if there are enough lines to read
-        if len(array) < n_columns_required:
+        if len(words) < n_columns_required:
             raise ValueError(
                 f"Failed to read xs data from string:\n"
                 f"\n{string.encode('unicode_escape')}\n\n"
                 f"The index map requires at least {n_columns_required} columns "
-                f"but only {len(array)} was found in the string.\n"
+                f"but only {len(words)} was found in the string.\n"
                 f"Index map = {xsindices}"
                 )
 
-        for xs_name in xsindices:
-            idx = xsindices[xs_name]
-            xs_data[xs_name].append(array[idx])
+        rows.append(words[:n_columns_required])
+
+    # Convert the whole block at once, each row of the transpose is an array
+    array = np.array(rows, dtype=np.float64).reshape(len(rows), n_columns_required)
+    columns = array.T.copy()
+
+    xs_data = {}
+    for xs_name, idx in xsindices.items():
+        xs_data[xs_name] = columns[idx]
 
     return xs_data
 
 
-def parse_scatter_matrix(strings):
+def parse_scatter_matrix(strings, ngroups=None):
     """Parse an array of strings for a scatter matrix.
 
     Given an matrix like
@@ -285,30 +318,34 @@ def parse_scatter_matrix(strings):
     Parameters
     ----------
     strings : a string arrays consisting of a matrix.
+    ngroups : number of energy groups (defaults to the length of the first row).
 
     Return
     ------
     An array of the flattened scatter matrix.
     """
-    scatter_matrix = []
-    ngroups = len(strings[0].strip().split())
+    if ngroups is None:
+        ngroups = len(strings[0].split())
 
-    for string in strings:
-        array = [np.float64(word) for word in string.strip().split()]
+    # Rows are converted directly into a preallocated matrix
+    scatter_matrix = np.empty((len(strings), ngroups), dtype=np.float64)
+
+    for i, string in enumerate(strings):
+        words = string.split()
 
-        if len(array) != ngroups:
+        if len(words) != ngroups:
             raise ValueError(
                 f"Failed to read sigma_s from string:\n"
                 f"\n{string.encode('unicode_escape')}\n\n"
-                f"The number of energy groups required is {ngroups} but {len(array)} was found"
+                f"The number of energy groups required is {ngroups} but {len(words)} was found"
                 )
 
-        scatter_matrix.extend(array)
+        scatter_matrix[i] = words
 
-    return scatter_matrix
+    return scatter_matrix.reshape(-1)
 
 
-def _parse_nuclide(strings, ngroups, marks=None, xsindices=None):
+def _parse_nuclide(strings, ngroups, marks=None, xsindices=None, elementmap=None):
     """Parse an array of strings for a Nuclide object.
 
     The array of strings must follow the format of 'infilecross' files. It must contains
@@ -322,6 +359,7 @@ def _parse_nuclide(strings, ngroups, marks=None, xsindices=None):
     strings : a string arrays indicating a NuclideSet.
     ngroups : number of energy groups.
     marks : line numbers of data sections (1-based).
+    elementmap : elements map for nuclide names (see parse_nuclide_name).
 
     Examples
     --------
@@ -356,7 +394,7 @@ def _parse_nuclide(strings, ngroups, marks=None, xsindices=None):
             )
 
     header_idx = marks["header"] - 1
-    name, number, mass = parse_nuclide_name(strings[header_idx])
+    name, number, mass = parse_nuclide_name(strings[header_idx], elementmap)
     nuclide = nuclides.Nuclide(name=name, number=number, mass=mass, ngroups=ngroups)
 
     # Parse the strings for cross-section arrays
@@ -372,13 +410,15 @@ def _parse_nuclide(strings, ngroups, marks=None, xsindices=None):
     # Parse the strings for the scatter matrix
     matrix_idx = xs_idx + ngroups
     nuclide["scatter matrix"] = parse_scatter_matrix(
-        strings=strings[matrix_idx:matrix_idx+ngroups]
+        strings=strings[matrix_idx:matrix_idx+ngroups],
+        ngroups=ngroups
     )
 
     return nuclide
 
 
-def parse_nuclideset(strings, setmarks=None, nuclidemarks=None, xsindices=None):
+def parse_nuclideset(strings, setmarks=None, nuclidemarks=None, xsindices=None,
+                     elementmap=None):
     """Parse an array of strings for a NuclideSet object.
 
     The array of strings must follow the format of 'infilecross' files. It must contains
@@ -395,6 +435,7 @@ def parse_nuclideset(strings, setmarks=None, nuclidemarks=None, xsindices=None):
     setmarks : line numbers of nuclide set data sections (1-based).
     nuclidemarks : line numbers of nuclide data sections (1-based).
     xsindices : column indices of each cross-section array (see parse_xs_arrays).
+    elementmap : elements map for nuclide names (see parse_nuclide_name).
 
     Examples
     --------
@@ -442,44 +483,29 @@ def parse_nuclideset(strings, setmarks=None, nuclidemarks=None, xsindices=None):
     nuclideset.nnuclides, nuclideset.ngroups = parse_count_nuclides_groups(
         strings[setmarks["counts"] - 1]
         )
-    nuclideset.chi = np.array(
-        parse_chi(strings[setmarks["chi"] - 1])
-        )
-
-    # Determine the number of lines for a nuclide
-    start_idx = setmarks["nuclides"] - 1
-    end_idx = start_idx + 1
-    while end_idx < len(strings):
-        string = strings[end_idx]
-        try:
-            parse_nuclide_name(string)
-        except ValueError:
-            if re.search(r"[a-z]+[a-z]+", string, re.I):
-                warnings.warn(
-                    f"While reading nuclide set {nuclideset.uid}, "
-                    f"a line containing words was skipped:\n"
-                    f"\n{string.encode('unicode_escape')}\n\n"
-                    f"This could be a mistake."
-                    )
-        except Exception as e:
-            raise e
-        else:
-            break
-        end_idx += 1
+    nuclideset.chi = parse_chi(strings[setmarks["chi"] - 1])
 
-    if end_idx == len(strings):
-        end_idx -= 1
+    # Set up the default nuclidemarks, see _parse_nuclide(...)
+    if not nuclidemarks:
+        nuclidemarks = {
+            "header": 1,
+            "xs": 12
+        }
 
-    rows_nuclide = end_idx - start_idx
+    # Determine the number of lines for a nuclide. The layout is fixed: extra lines
+    # before the cross-section arrays, followed by ngroups lines of cross-section
+    # arrays and ngroups lines of the scatter matrix.
+    rows_nuclide = nuclidemarks["xs"] - 1 + 2 * nuclideset.ngroups
+    rows_found = min(rows_nuclide, len(strings) - setmarks["nuclides"] + 1)
 
     # Check whether there are enough strings to parse
     min_rows_nuclide = 1 + 2 * nuclideset.ngroups
-    if rows_nuclide < min_rows_nuclide:
+    if rows_found < min_rows_nuclide:
         raise ValueError(
             f"Failed to read nuclide set {nuclideset.uid} from strings:\n"
             "\n{}\n\t... {} more lines\n\n".format("\n".join(strings[:15]), len(strings)-15) +
             f"{min_rows_nuclide} lines required for the first nuclide "
-            f"but {rows_nuclide} was found.\n"
+            f"but {rows_found} was found.\n"
             )
 
     rows_required = max(setmarks.values()) - 1 + rows_nuclide * nuclideset.nnuclides
@@ -508,20 +534,32 @@ def parse_nuclideset(strings, setmarks=None, nuclidemarks=None, xsindices=None):
                 strings=strings[start_idx:end_idx],
                 ngroups=nuclideset.ngroups,
                 marks=nuclidemarks,
-                xsindices=xsindices
+                xsindices=xsindices,
+                elementmap=elementmap
             )
         )
 
     return nuclideset
 
 
-def find_nuclidesets(strings, setmarks=None, nuclidemarks=None, xsindices=None):
+def load_infilecross(path):
+    """Read the whole content of an 'infilecross' file as bytes.
+
+    The content can be passed to find_nuclidesets(...) directly.
+    """
+    return pathlib.Path(path).read_bytes()
+
+
+def find_nuclidesets(strings, setmarks=None, nuclidemarks=None, xsindices=None,
+                     elementmap=None):
     """Find all NuclideSet data sections in an array of strings.
 
     This function simply calls parse_nuclideset(...) multiple times to get all of the
     NuclideSet data sections from a string array.
 
-    The string array usually consists of all lines of an "infilecross" file.
+    The string array usually consists of all lines of an "infilecross" file. The
+    whole content of the file is also accepted as a str or bytes object, which is
+    split into lines at once (see load_infilecross(...)).
 
     Parameters
     ----------
@@ -531,33 +569,31 @@ def find_nuclidesets(strings, setmarks=None, nuclidemarks=None, xsindices=None):
     ------
     A dictionary of NuclideSet object indexed by set ID.
     """
+    if isinstance(strings, bytes):
+        strings = strings.decode()
+    if isinstance(strings, str):
+        strings = strings.splitlines()
+
+    # Resolve the elements map once for all of the nuclides
+    if not elementmap:
+        elementmap = str(_DEFAULT_ELEMENT_MAP)
 
-    # Each of the nuclide set sections starts with a line marked by "$"
-    def find_start(strings, pos=0):
-        start_mark = r"[ \t]*\$.*"
-        while pos < len(strings):
-            if re.match(start_mark, strings[pos]):
-                return pos
-            pos += 1
-        return len(strings)
+    # Each of the nuclide set sections starts with a line marked by "$", and all of
+    # the starts are found in a single pass
+    starts = [i for i, string in enumerate(strings) if _SET_START.match(string)]
+    starts.append(len(strings))
 
     nuclidesets = {}
-    end = -1
-
-    while end < len(strings):
-        start = find_start(strings, end)
-        end = find_start(strings, start + 1)
-
-        if start < end:
-            nuclideset = parse_nuclideset(
-                strings=strings[start:end],
-                setmarks=setmarks,
-                nuclidemarks=nuclidemarks,
-                xsindices=xsindices
-            )
-            nuclidesets[nuclideset.uid] = nuclideset
-        else:
-            break
+
+    for start, end in zip(starts, starts[1:]):
+        nuclideset = parse_nuclideset(
+            strings=strings[start:end],
+            setmarks=setmarks,
+            nuclidemarks=nuclidemarks,
+            xsindices=xsindices,
+            elementmap=elementmap
+        )
+        nuclidesets[nuclideset.uid] = nuclideset
 
     return nuclidesets
 
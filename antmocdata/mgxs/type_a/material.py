@@ -11,6 +11,10 @@ import numpy as np
 from ..materialxml import MaterialXML
 
 
+# Cross-sections stored as flattened ngroups x ngroups matrices
+_MATRIX_XS = frozenset({"scatter matrix"})
+
+
 class MaterialTypeA(MaterialXML):
     # Redefine the list since there is no cross-section 'total'
     xslist = [
@@ -22,6 +26,10 @@ class MaterialTypeA(MaterialXML):
         "scatter matrix",
     ]
 
+    # Cross-sections summed up over nuclides. Chi is excluded since it is defined
+    # for all nuclides in a set.
+    _sum_xs = tuple(xsname for xsname in xslist if xsname != "chi")
+
     def __init__(self, node=None, nocheck=False):
         super().__init__(node=node, nocheck=nocheck)
 
@@ -37,14 +45,16 @@ class MaterialTypeA(MaterialXML):
 
         # Reset all of the data arrays
         for xsname in MaterialTypeA.xslist:
-            if xsname.find('scatter') >= 0:
+            if xsname in _MATRIX_XS:
                 self[xsname] = np.zeros(
                     (self.ngroups * self.ngroups,), dtype=np.float64
                 )
             else:
                 self[xsname] = np.zeros(self.ngroups, dtype=np.float64)
 
-        # Loop over all density weights and associated nuclides
+        # Collect rows of nuclides with non-zero density weights
+        rows = []
+        weights = []
         for nuclideid, weight in self.weights.items():
 
             # Skip zero-weight nuclide
@@ -63,15 +73,14 @@ class MaterialTypeA(MaterialXML):
                     f"details of the nuclide set:\n{nuclideset}"
                     )
 
-            nuclide = nuclideset[nuclideid]
+            rows.append(nuclideset.row(nuclideid))
+            weights.append(weight)
 
-            # Sum up cross-sections over nuclides
-            for xsname in MaterialTypeA.xslist:
-                if xsname == "chi":
-                    # Skip Chi array since it is defined for all nuclides in a set.
-                    continue
-                else:
-                    self[xsname] += np.array(nuclide[xsname]) * weight
+        # Sum up cross-sections over nuclides, one matrix-vector product per array
+        if rows:
+            weights = np.array(weights, dtype=np.float64)
+            for xsname in MaterialTypeA._sum_xs:
+                self[xsname] = weights @ nuclideset.as_matrix(xsname)[rows]
 
         # Chi, defined for all nuclides in a set
         self['chi'] = nuclideset.chi
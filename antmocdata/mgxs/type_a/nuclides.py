@@ -23,7 +23,18 @@ class Nuclide:
 
     >>> print(Cr50.name, Cr50.number, Cr50.mass, Cr50.uid())
     CHROMIUM 24 50 24050
+
+    Nu-fission is computed from nu and fission when it is first read
+    >>> Cr50["nu"], Cr50["fission"] = np.array([2.0]), np.array([0.5])
+    >>> Cr50["nu-fission"]
+    array([1.])
+    >>> Cr50["nu"] = np.array([3.0])
+    >>> Cr50["nu-fission"]
+    array([1.5])
     """
+    # Many nuclides are created from a cross-section library
+    __slots__ = ("name", "number", "mass", "ngroups", "data", "_arrays", "_sets")
+
     def __init__(self, name="", number=0, mass=0, ngroups=0):
         """Construct a Nuclide object.
 
@@ -49,14 +60,45 @@ class Nuclide:
         # Cross-sections
         self.data = {}
 
+        # Cross-sections converted to contiguous float64 arrays, see as_array(...)
+        self._arrays = {}
+
+        # Sets containing this nuclide, whose matrices depend on its arrays
+        self._sets = []
+
     def __getitem__(self, xsname):
-        if xsname not in self.data and xsname == "nu-fission":
-            # Compute nu-fission as needed
-            self.data[xsname] = np.array(self.data["nu"]) * np.array(self.data["fission"])
-        return self.data[xsname]
+        try:
+            return self.data[xsname]
+        except KeyError:
+            if xsname != "nu-fission":
+                raise
+
+        # Compute nu-fission as needed, it is dropped if nu or fission changes
+        array = self.data[xsname] = np.multiply(self.data["nu"], self.data["fission"])
+        return array
 
     def __setitem__(self, xsname, array):
         self.data[xsname] = array
+        changed = [xsname]
+        if xsname in ("nu", "fission"):
+            self.data.pop("nu-fission", None)
+            changed.append("nu-fission")
+
+        # Drop arrays derived from the changed cross-sections
+        for name in changed:
+            self._arrays.pop(name, None)
+            for nuclideset in self._sets:
+                nuclideset._matrices.pop(name, None)
+
+    def as_array(self, xsname):
+        """Return a cross-section as a contiguous float64 array.
+
+        The array is converted once and reused by later calls, so it should not
+        be modified.
+        """
+        if xsname not in self._arrays:
+            self._arrays[xsname] = np.ascontiguousarray(self[xsname], dtype=np.float64)
+        return self._arrays[xsname]
 
     def uid(self):
         """Return the ID of this nuclide.
@@ -96,6 +138,8 @@ class NuclideSet:
     >>> nuclideset = NuclideSet()
 
     """
+    __slots__ = ("uid", "nnuclides", "ngroups", "chi", "nuclides", "_rows", "_matrices")
+
     def __init__(self, uid=0, nnuclides=0, ngroups=0):
         """Instantiate a NuclideSet."""
         # NuclideSet ID
@@ -113,9 +157,33 @@ class NuclideSet:
         # Nuclides (nuclide uid -> nuclide object)
         self.nuclides = {}
 
+        # Cross-sections of all nuclides packed by rows, see as_matrix(...)
+        self._rows = {}
+        self._matrices = {}
+
     def __getitem__(self, nuclideid):
         return self.nuclides[nuclideid]
 
+    def row(self, nuclideid):
+        """Return the row of a nuclide in the matrices returned by as_matrix(...)."""
+        if not self._rows:
+            self._rows = {uid: row for row, uid in enumerate(self.nuclides)}
+        return self._rows[nuclideid]
+
+    def as_matrix(self, xsname):
+        """Return a cross-section of all nuclides as a contiguous float64 matrix.
+
+        Each row of the matrix holds the cross-section of a nuclide, which could
+        be located by row(...). Cross-sections of a set are laid out this way so
+        that they can be weighted and summed up in a single product. The matrix
+        is built once and reused by later calls until a nuclide is added or a
+        cross-section of a nuclide is assigned, so it should not be modified.
+        """
+        if xsname not in self._matrices:
+            arrays = [nuclide.as_array(xsname) for nuclide in self.nuclides.values()]
+            self._matrices[xsname] = np.stack(arrays) if arrays else np.empty((0, 0))
+        return self._matrices[xsname]
+
     def keys(self):
         """Return keys of the nuclide dictionary."""
         return self.nuclides.keys()
@@ -126,7 +194,16 @@ class NuclideSet:
 
     def add_nuclide(self, nuclide):
         """Add a nuclide to the set."""
-        self.nuclides[nuclide.uid()] = nuclide
+        uid = nuclide.uid()
+        replaced = self.nuclides.get(uid)
+        if replaced is not None and replaced is not nuclide:
+            replaced._sets.remove(self)
+        if self not in nuclide._sets:
+            nuclide._sets.append(self)
+
+        self.nuclides[uid] = nuclide
+        self._rows = {}
+        self._matrices = {}
 
     def size(self):
         """Number of nuclides in the set."""
@@ -9,14 +9,40 @@ import numpy as np
 import h5py
 from pyevtk.hl import pointsToVTK
 
+# FSR point types, in the order of preference
+_POINT_TYPES = ("Points", "Centroids")
+_POINT_SET = frozenset(_POINT_TYPES)
+
+# Each of the tally type has several datasets
+_TALLY_TYPES = frozenset(
+    [
+        "Fission RX",
+        "NuFission RX",
+        "Total RX",
+        "Absorption RX",
+        "Scalar Flux",
+        "Fission XS",
+        "NuFission XS",
+        "Total XS",
+        "Absorption XS",
+    ]
+)
+
 
 def _get_numpy_array(hdf5_group, key):
     """A helper routine to ensure that the data is a proper NumPy array"""
 
-    data_array = np.array(hdf5_group[f"{key}/"][...])
-    data_array = np.atleast_1d(data_array)
-    data_array = data_array.flatten()
-    return data_array
+    dataset = hdf5_group[f"{key}/"]
+
+    # Scalars can't be read into a buffer directly
+    if dataset.ndim == 0:
+        return np.atleast_1d(dataset[()])
+
+    # Reads the dataset into a single buffer, which is flattened without copy
+    data_array = np.empty(dataset.shape, dtype=dataset.dtype)
+    if data_array.size > 0:
+        dataset.read_direct(data_array)
+    return data_array.reshape(-1)
 
 
 def convert_h5_to_vtk(file, out=None):
@@ -45,40 +71,27 @@ def convert_h5_to_vtk(file, out=None):
         )
 
     # Check that the file has FSR points or centroids
-    point_types = ["Points", "Centroids"]
     point_type = ""
-    for t in point_types:
+    for t in _POINT_TYPES:
         if t in file[domain_type]:
             point_type = t
             break
-    if point_type in point_types:
+    if point_type in _POINT_SET:
         print(f'FSR point type is "{point_type}"')
     else:
         raise ValueError(
             f"Failed to parse {file.filename}: missing valid FSR point type (Points or Centroids)"
         )
 
-    # Each of the tally type has several datasets
-    tally_types = [
-        "Fission RX",
-        "NuFission RX",
-        "Total RX",
-        "Absorption RX",
-        "Scalar Flux",
-        "Fission XS",
-        "NuFission XS",
-        "Total XS",
-        "Absorption XS",
-    ]
-
     # Instantiate dictionary to hold FSR data
     fsr_points = {}
     fsr_data = {}
     num_fsrs = int(file.attrs["# fsrs"])
 
     # Iterate over all domains (e.g., fsrs, tracks) in the HDF5 file
+    # HDF5 groups are iterated in name order, so no sorting is needed
     domain_obj = file[domain_type]
-    for group_name in sorted(domain_obj):
+    for group_name in domain_obj:
 
         print(f'Found data for {domain_type} "{str(group_name)}"')
 
@@ -86,7 +99,7 @@ def convert_h5_to_vtk(file, out=None):
         group_obj = domain_obj[group_name]
 
         # Read FSR centroids from the file
-        if group_name in point_types:
+        if group_name in _POINT_SET:
             if group_name == point_type:
                 print(f"Importing data for {group_name} X Y Z")
                 fsr_points["X"] = _get_numpy_array(group_obj, "X")
@@ -99,8 +112,8 @@ def convert_h5_to_vtk(file, out=None):
             fsr_data[group_name] = _get_numpy_array(domain_obj, group_name)
 
         # Read reaction rates from the file
-        elif group_name in tally_types:
-            for energy_name in sorted(group_obj):
+        elif group_name in _TALLY_TYPES:
+            for energy_name in group_obj:
 
                 # Set the name of the data array
                 array_name = group_name
@@ -5,11 +5,82 @@ Tools for VTK files of reaction rates and fluxes.
 Author: An Wang, USTB (wangan.cs@gmail.com)
 """
 
+import collections
+import concurrent.futures
+import os
 import re
 import xml.etree.ElementTree as ET
 import numpy as np
 
-def load_vtk(file, filters = []):
+try:
+    import numba
+except ImportError:
+    numba = None
+
+def _cell_indices(indices, nx, ny, nz, num_cells_xy):
+    """Computes positions in a flattened 3D array for all z-sections and x-y cells."""
+    indx = indices[:nz * num_cells_xy]
+    z = np.repeat(np.arange(nz, dtype=np.int64), num_cells_xy)
+    j = ny - 1 - indx // nx % ny # revert the y-axis
+    k = indx % nx
+    return (z * ny + j) * nx + k
+
+def _scatter_numpy(values, cells, nz, num_cells_xy, result):
+    """Writes values of all z-sections and x-y cells to a 3D array."""
+    result.reshape(-1)[cells] = values[:len(cells)]
+
+def _sum_and_nnz_numpy(data):
+    """Computes the sum and the number of non-zeros of an array."""
+    return float(np.sum(data)), int(np.count_nonzero(data))
+
+if numba is not None:
+    @numba.njit(parallel=True, cache=True)
+    def _scatter(values, cells, nz, num_cells_xy, result):
+        """Writes values of all z-sections and x-y cells to a 3D array."""
+        flat = result.reshape(-1)
+        for z in numba.prange(nz):
+            for count in range(num_cells_xy):
+                lookup_count = count + z * num_cells_xy
+                flat[cells[lookup_count]] = values[lookup_count]
+
+    @numba.njit(cache=True)
+    def _sum_and_nnz(data):
+        """Computes the sum and the number of non-zeros in a single pass."""
+        total = 0.0
+        count = 0
+        flat = data.ravel()
+        for i in range(flat.size):
+            v = flat[i]
+            total += v
+            if v != 0:
+                count += 1
+        return total, count
+else:
+    _scatter = _scatter_numpy
+    _sum_and_nnz = _sum_and_nnz_numpy
+
+def _compile_filters(filters):
+    """Compiles filters into a list of regexes.
+    Filters starting with the same literal character are joined into a single
+    alternation, so that each group is searched only once.
+    """
+    groups = {}
+    regexes = []
+    for x in filters:
+        regex = re.compile(x)
+
+        # Patterns with groups are not joined to keep group references valid
+        if x[:1] and x[0] not in '.^$*+?{}[]\\|()' and regex.groups == 0:
+            groups.setdefault(x[0], []).append(x)
+        else:
+            regexes.append(regex)
+
+    for group in groups.values():
+        regexes.append(re.compile('|'.join(f'(?:{x})' for x in group)))
+
+    return regexes
+
+def load_vtk(file, filters = [], dtype = np.float32):
     """Converts a VTK formatted mesh into numpy arrays.
     This method takes the .vtu output of ANT-MOC as its argument and
     extracts data at all the z-sections. All the reaction rates are
@@ -36,87 +107,142 @@ def load_vtk(file, filters = []):
     ----------
         file: file path or file object of the VTK file
         filters: string array, regexes of reaction rate names
+        dtype: data type of the numpy arrays, defaults to float32
 
     Returns
     -------
         A dictionary of numpy arrays
     """
 
-    # Parses the XML file and returns root
-    tree = ET.parse(file)
-    root = tree.getroot()
-
-    # Finds the extent of the mesh and the number of lattice cells
-    piece = root.find('.//Piece')
-    extent = piece.get('Extent').split(' ')
-    num_cells_xy = int(piece.get('NumberOfCellsXY'))
+    # Compiles the filters once for all data arrays
+    filters = _compile_filters(filters)
 
-    # Computes the dimensions of the mesh
-    nx = int(extent[0])
-    ny = int(extent[1])
-    nz = int(extent[2])
-
-    print(f'Mesh dimensions = [{nx}, {ny}, {nz}]')
-    
     # Initializes a numpy array dictionary
     arrays = {}
 
-    # Gets all of the valid indices
-    cell_data = piece.find('CellData')
-    valid_indices = []
-    for data_array in cell_data.findall('DataArray'):
-        data_name = data_array.get('Name')
-        if data_name == 'Valid Indices':
-            data = data_array.text.split()
-            valid_indices = [int(i) for i in data]
-
     # Processes data arrays one by one
     # This is done by first extract an array of data from a XML node
     # and then write it down to a numpy array
     imported_arrays = []
     skipped_arrays = []
-    for data_array in cell_data.findall('DataArray'):
-        data_name = data_array.get('Name')
 
-        # Skips unwanted reaction rates
-        if filters and len(filters) > 0:
-            if sum([1 if re.search(x, data_name) else 0 for x in filters]) == 0:
-                skipped_arrays.append(data_name)
-                continue
-        # If rates are not specified, extract all the arrays
-        imported_arrays.append(data_name)
+    # Data arrays being parsed by the thread pool, as (name, future)
+    parsed_arrays = collections.deque()
+    valid_indices = None
+
+    # Positions of the valid indices in the 3D arrays, which are computed
+    # once for all data arrays
+    cells = None
+    full_coverage = None
 
-        # Creates a 3D numpy array
-        result = np.zeros((nz, ny, nx))
+    def import_array(data_name, values):
+        nonlocal cells, full_coverage
 
-        # Reads reaction rates.
-        data = data_array.text.split()
+        # The kernel doesn't check bounds
+        num_cells = nz * num_cells_xy
+        if len(values) < num_cells or len(valid_indices) < num_cells:
+            raise ValueError(
+                f'Data array \'{data_name}\' or valid indices have less than {num_cells} values')
 
         # Remember that (i,j) is the position in the tally mesh and should
         # be mapped into the Cartesian coordinate system.
-        # Iterates z-sections and x-y cells.
-        for z in range(nz):
-            for count in range(num_cells_xy):
-                # Sums up reaction rates along the z-axis
-                value = 0.
-                lookup_count = count + z * num_cells_xy
-                value = float(data[lookup_count])
+        if cells is None:
+            cells = _cell_indices(valid_indices, nx, ny, nz, num_cells_xy)
+            full_coverage = np.unique(cells).size == nz * ny * nx
 
-                # Computes the lattice cell position in the 3D array
-                indx = valid_indices[lookup_count]
-                x = int(indx % nx)
-                y = int(indx // nx % ny)
-                j = ny - 1 - y # revert the y-axis
-                k = x
-                result[z, j, k] = value
+        # Creates a 3D numpy array, which needs no initialization if all the
+        # cells are to be written
+        if full_coverage:
+            result = np.empty((nz, ny, nx), dtype=dtype)
+        else:
+            result = np.zeros((nz, ny, nx), dtype=dtype)
+
+        _scatter(values, cells, nz, num_cells_xy, result)
 
         # Saves the array to the numpy array dictionary
         arrays[data_name] = result
 
+    def flush_arrays(wait):
+        # Imports parsed arrays in the order of the file
+        while parsed_arrays and (wait or parsed_arrays[0][1].done()):
+            data_name, future = parsed_arrays.popleft()
+            import_array(data_name, future.result())
+
+    # Parses the XML file as a stream, so that data arrays are released as
+    # soon as they are imported. Only the first Piece and its CellData are
+    # read. Text of data arrays is parsed by a thread pool, while the arrays
+    # are imported in the main thread.
+    piece = None
+    cell_data = None
+    elements = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for event, elem in ET.iterparse(file, events=('start', 'end')):
+            if event == 'start':
+                elements.append(elem)
+                parent = elements[-2] if len(elements) > 1 else None
+
+                if elem.tag == 'Piece' and piece is None:
+                    # Finds the extent of the mesh and the number of lattice cells
+                    piece = elem
+                    extent = piece.get('Extent').split(' ')
+                    num_cells_xy = int(piece.get('NumberOfCellsXY'))
+
+                    # Computes the dimensions of the mesh
+                    nx = int(extent[0])
+                    ny = int(extent[1])
+                    nz = int(extent[2])
+
+                    print(f'Mesh dimensions = [{nx}, {ny}, {nz}]')
+
+                elif elem.tag == 'CellData' and parent is piece and cell_data is None:
+                    cell_data = elem
+                continue
+
+            elements.pop()
+
+            if elem is piece:
+                break
+
+            if elem.tag != 'DataArray' or not elements or elements[-1] is not cell_data:
+                continue
+
+            data_name = elem.get('Name')
+            text = elem.text or ''
+            elem.clear()
+
+            # Gets all of the valid indices
+            if data_name == 'Valid Indices':
+                valid_indices = np.fromstring(text, dtype=np.int64, sep=' ')
+
+            # Skips unwanted reaction rates
+            if filters and not any(x.search(data_name) for x in filters):
+                skipped_arrays.append(data_name)
+                continue
+            # If rates are not specified, extract all the arrays
+            imported_arrays.append(data_name)
+
+            # Reads reaction rates.
+            future = executor.submit(np.fromstring, text, dtype=dtype, sep=' ')
+            parsed_arrays.append((data_name, future))
+
+            # Arrays read before the valid indices are kept until the indices
+            # are available
+            if valid_indices is not None:
+                flush_arrays(wait=False)
+
+        # Imports the rest of arrays
+        if valid_indices is None:
+            valid_indices = np.empty(0, dtype=np.int64)
+        flush_arrays(wait=True)
+
     print(f'Imported data array(s): {imported_arrays}')
     print(f'Skipped data array(s): {skipped_arrays}')
     print('Done.')
     return arrays
 
 def normalize(data):
-    return data / np.sum(data) * np.count_nonzero(data)
\ No newline at end of file
+    total, count = _sum_and_nnz(np.asarray(data))
+    # Keeps the data type of floating-point arrays. Arrays of zeros are
+    # scaled by NaN, as NumPy does for 0/0.
+    scale = np.result_type(data.dtype, np.float32).type(np.float64(count) / total)
+    return data * scale
\ No newline at end of file
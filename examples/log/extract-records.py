@@ -61,3 +61,5 @@ logdb.setup(options)
 extractor = TinyExtractor(logdb)
 extractor.setup(options)
 extractor.extract()
+
+logdb.close()
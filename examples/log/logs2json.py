@@ -32,6 +32,7 @@ t_start = timeit.default_timer()
 
 # Read log files and dump them into json files
 logdb.save(options("savedb"))
+logdb.close()
 
 t_stop = timeit.default_timer()
 print(f"Time = {(t_stop - t_start):.3f} s")
@@ -3,7 +3,6 @@
 Generate a .h5 XS file from the materials.xml
 """
 import sys
-import xml.etree.ElementTree as ET
 import h5py
 from antmocdata.mgxs.options import Options
 from antmocdata.mgxs.manip import h5, xml
@@ -23,9 +22,13 @@ if options("help"):
     options.help()
     sys.exit(1)
 
-xmltree = ET.parse(options("input"))
-
-materials = xml.find_materials(xmltree)
+# Materials are read one by one without keeping the whole XML tree
+materials = {
+    material.name: material for material in xml.iter_materials(options("input"))
+}
 
 with h5py.File(options("output"), 'w') as outputfile:
-    h5.dump_materials(materials, outputfile, layout="named")
+    h5.dump_materials(
+        materials, outputfile, layout="named", compression=options("compression"),
+        dtype=options("precision")
+        )
@@ -3,7 +3,6 @@
 Check the total XS, find negative XS records
 """
 import sys
-import h5py
 from antmocdata.mgxs.options import Options
 import antmocdata.mgxs.manip.h5 as manip
 
@@ -24,6 +23,8 @@ if options("help"):
     options.help()
     sys.exit(1)
 
-with h5py.File(options("input"), 'r') as inputfile:
-    manip.check_sigma_t(inputfile, layout=options("layout"))
-    manip.check_negative_xs(inputfile, layout=options("layout"))
+with manip.open_h5(options("input"), 'r', rdcc_nbytes=options("cache-bytes")) as inputfile:
+    # Read the materials once for all of the checks
+    materials = manip.snapshot_materials(inputfile, layout=options("layout"))
+    manip.check_sigma_t(materials)
+    manip.check_negative_xs(materials)
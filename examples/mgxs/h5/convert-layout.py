@@ -3,7 +3,6 @@
 Conversion between `Named` and `Compact` layouts
 """
 import sys
-import h5py
 from antmocdata.mgxs.options import Options
 import antmocdata.mgxs.manip.h5 as manip
 
@@ -28,9 +27,13 @@ if inputlayout == "named":
 else:
     outputlayout = "named"
 
-with h5py.File(options("input"), 'r') as inputfile:
-    with h5py.File(options("output"), 'w') as outputfile:
-        manip.convert_layout(inputfile, outputfile, layout=inputlayout)
+cache_bytes = options("cache-bytes")
+with manip.open_h5(options("input"), 'r', rdcc_nbytes=cache_bytes) as inputfile:
+    with manip.open_h5(options("output"), 'w', rdcc_nbytes=cache_bytes) as outputfile:
+        manip.convert_layout(
+            inputfile, outputfile, layout=inputlayout,
+            compression=options("compression"), dtype=options("precision")
+            )
 
 print(f"Successfully converted layout '{inputlayout}' to '{outputlayout}'")
 print(f"The output file is '{options('output')}'")
@@ -4,7 +4,6 @@ Try to make cross-section arrays consistent
 """
 import os
 import sys
-import h5py
 from antmocdata.mgxs.options import Options
 import antmocdata.mgxs.manip.h5 as manip
 
@@ -32,10 +31,12 @@ outputpath = os.path.abspath(options("output"))
 if inputpath == outputpath:
     raise ValueError(f"Use the input file as the output is not permitted: {inputpath}")
 
-with h5py.File(inputpath, 'r') as inputfile:
-    with h5py.File(outputpath, 'w') as outputfile:
+cache_bytes = options("cache-bytes")
+with manip.open_h5(inputpath, 'r', rdcc_nbytes=cache_bytes) as inputfile:
+    with manip.open_h5(outputpath, 'w', rdcc_nbytes=cache_bytes) as outputfile:
         manip.fix_materials(
-            inputfile, outputfile, xs=options("fix"), layout=options("layout")
+            inputfile, outputfile, xs=options("fix"), layout=options("layout"),
+            compression=options("compression"), dtype=options("precision")
             )
 
 print(f"Successfully fixed '{options('fix')}' for '{inputpath}'")
@@ -3,7 +3,6 @@
 Load and print material files
 """
 import sys
-import h5py
 from antmocdata.mgxs.options import Options
 import antmocdata.mgxs.manip.h5 as manip
 
@@ -21,7 +20,7 @@ if options("help"):
     options.help()
     sys.exit(1)
 
-with h5py.File(options("input"), 'r') as file:
+with manip.open_h5(options("input"), 'r', rdcc_nbytes=options("cache-bytes")) as file:
     materials = manip.load_materials(
         file=file, layout=options("layout"))
 
@@ -15,8 +15,7 @@ if options("help"):
     options.help()
     exit(1)
 
-with open(options("sets"), mode="r") as file:
-    all_sets = infilecross.find_nuclidesets(file.readlines())
+all_sets = infilecross.find_nuclidesets(infilecross.load_infilecross(options("sets")))
 
 for nuclideset in all_sets.values():
     print(f"{nuclideset}\n")
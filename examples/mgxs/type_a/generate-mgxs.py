@@ -1,15 +1,17 @@
 #!/usr/bin/env python3
 
 import sys
-import xml.etree.ElementTree as ET
 from antmocdata.mgxs.type_a import Options
 from antmocdata.mgxs.type_a import infilecross, generate_mgxs_h5
+from antmocdata.mgxs.manip.xml import parse_xml
 
 
 options = Options()
 
 # Additional options
 options.add(name="fix-scatter", dtype=bool, doc="Fix scatter matrices")
+options.add(name="nprocs", shortname="n", default=1, dtype=int,
+            doc="Number of processes to compute materials")
 
 # Reset defaults
 options["output"].default = "./mgxs.h5"
@@ -23,7 +25,7 @@ if options("help"):
     exit(1)
 
 # Read densities
-xmltree = ET.parse(options("materials"))
+xmltree = parse_xml(options("materials"))
 
 # Set up marks for nuclide set data sections.
 # This could be commented out to use the default marks.
@@ -42,19 +44,21 @@ nuclidemarks = {
 }
 
 # Read nuclide sets
-with open(options("sets"), "r") as file:
-    allsets = infilecross.find_nuclidesets(
-        strings=file.readlines(),
-        setmarks=setmarks,
-        nuclidemarks=nuclidemarks
-        )
+allsets = infilecross.find_nuclidesets(
+    strings=infilecross.load_infilecross(options("sets")),
+    setmarks=setmarks,
+    nuclidemarks=nuclidemarks
+    )
 
 # Generate an H5 file for materials
 generate_mgxs_h5(
     file=options("output"),
     xmltree=xmltree,
     nuclidesets=allsets,
-    fixscatter=options("fix-scatter")
+    fixscatter=options("fix-scatter"),
+    nprocs=options("nprocs"),
+    compression=options("compression"),
+    dtype=options("precision")
     )
 
 print("Successfully generated file {}".format(options("output")))
@@ -2,10 +2,23 @@
 
 import sys
 import json
-import xml.etree.ElementTree as ET
 import antmocdata.mgxs.manip.xml as manip
 from antmocdata.mgxs.options import Options
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def load_json(filename):
+    """Read a json file with orjson if it is available."""
+    if orjson is not None:
+        with open(filename, "rb") as json_file:
+            return orjson.loads(json_file.read())
+    with open(filename, "r") as json_file:
+        return json.load(json_file)
+
 
 options = Options()
 
@@ -29,7 +42,7 @@ if options("help"):
     options.help()
     exit(1)
 
-xmltree = ET.parse(options("input"))
+xmltree = manip.parse_xml(options("input"))
 
 # Reset density for materials
 if options("fix-density"):
@@ -39,17 +52,15 @@ if options("fix-density"):
 # Reset nuclideset ids using an user-provided dictionary
 filename = options("nuclideset-ids")
 if filename:
-    with open(filename, "r") as json_file:
-        nuclideset_id_map = json.load(json_file)
-        xmltree = manip.reset_nuclideset_ids(xmltree, nuclideset_id_map)
+    nuclideset_id_map = load_json(filename)
+    xmltree = manip.reset_nuclideset_ids(xmltree, nuclideset_id_map)
     print("Successfully fixed nuclideset ids with file {}".format(filename))
 
 # Replace nuclide ids using an user-provided dictionary
 filename = options("nuclide-ids")
 if filename:
-    with open(filename, "r") as json_file:
-        nuclide_id_map = json.load(json_file)
-        xmltree = manip.replace_nuclide_ids(xmltree, nuclide_id_map)
+    nuclide_id_map = load_json(filename)
+    xmltree = manip.replace_nuclide_ids(xmltree, nuclide_id_map)
     print("Successfully fixed nuclide ids with file {}".format(filename))
 
 # Fix nuclide ids by adding suffixes
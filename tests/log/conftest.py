@@ -0,0 +1,81 @@
+"""Fixtures for testing module log"""
+
+import pytest
+from antmocdata.log import fields
+from antmocdata.log.fields import Field, LogFields
+
+
+@pytest.fixture
+def logfields():
+    """The LogFields singleton, restored after testing."""
+    logfields = LogFields()
+    data = dict(logfields.data)
+    yield logfields
+    logfields.data = data
+    logfields._reset_caches()
+
+
+@pytest.fixture
+def sample_log_dir(tmp_path):
+    """A directory of two small log files."""
+    for jobid, azims in [(101, 16), (102, 32)]:
+        path = tmp_path / f"{jobid}-sample.log"
+        path.write_text(
+            f"[  NORMAL ]  Case name       =   case-{jobid}\n"
+            f"[  NORMAL ]  Azimuthal angles  =  {azims}\n"
+            f"[  NORMAL ]  My key = value-{jobid}\n"
+        )
+    return tmp_path
+
+
+@pytest.fixture(params=["default", "no-hyperscan", "no-re2", "re"])
+def engines(request, monkeypatch, logfields):
+    """Fields compiled with the optional regex engines enabled or disabled."""
+    if request.param in ("no-hyperscan", "re"):
+        monkeypatch.setattr(fields, "hyperscan", None)
+    if request.param in ("no-re2", "re"):
+        monkeypatch.setattr(fields, "re2", None)
+    for field in logfields.values():
+        field.compile()
+    logfields._reset_caches()
+
+    yield request.param
+
+    monkeypatch.undo()
+    for field in logfields.values():
+        field.compile()
+    logfields._reset_caches()
+
+
+@pytest.fixture
+def sample_fields(engines):
+    """Fields covering the ways patterns are searched in log files."""
+    return [
+        Field(name="Value", patterns=["value[ \t]*=[ \t]*(.+)"]),
+        Field(
+            name="Order",
+            patterns=["alpha[ \t]*=[ \t]*(\\d+)", "beta[ \t]*=[ \t]*(\\d+)"],
+        ),
+        Field(name="Spread", patterns=["spread\\s*=\\s*(\\w+)"]),
+        Field(name="Tail", patterns=["tail:([^x]+)!"]),
+        Field(name="Missing", patterns=["never seen[ \t]*(\\d+)"]),
+    ]
+
+
+@pytest.fixture
+def sample_log_content():
+    """Log content with repeated fields separated by filler lines."""
+    filler = b"".join(b"[  NORMAL ]  filler line %d\n" % i for i in range(200))
+    return (
+        b"[  NORMAL ]  value = first\n"
+        + b"[  NORMAL ]  beta = 2\n"
+        + filler
+        + b"[  NORMAL ]  alpha = 1\n"
+        + b"[  NORMAL ]  spread =\n  early\n"
+        + filler
+        + b"[  NORMAL ]  tail: across\nlines!\n"
+        + b"[  NORMAL ]  beta = 3\n"
+        + b"[  NORMAL ]  value = last\n"
+        + b"[  NORMAL ]  spread =\n  late\n"
+        + filler
+    )
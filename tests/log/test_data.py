@@ -0,0 +1,191 @@
+"""Tests for module log.data"""
+
+import gc
+import re
+import pytest
+from multiprocessing import pool
+from antmocdata.log import data
+from antmocdata.log.data import LogDB, LogFile, LogFileSerializerTXT
+from antmocdata.log.fields import Field, FieldScanner
+
+
+def search_re(fields, content):
+    """Search for fields with plain re, the first pattern matching wins."""
+    matches = {}
+    for field in fields:
+        for pattern in field.patterns:
+            re_matched = re.findall(pattern.encode("utf-8"), content, re.I)
+            if re_matched:
+                matches[field.name] = re_matched[-1]
+                break
+    return matches
+
+
+class TestLogDB:
+    def test_query(self, sample_log_dir):
+        """Query log files in worker processes."""
+        db = LogDB(nprocs=2, filenames=[])
+        db.add_paths([str(sample_log_dir / "*.log")])
+        try:
+            records = db.query(["CaseName", "Azims"], sortby="Azims")
+        finally:
+            db.close()
+
+        assert [x[0]["CaseName"] for x in records] == ["case-101", "case-102"]
+
+    def test_query_new_field(self, sample_log_dir, logfields):
+        """Fields added after the worker pool was created."""
+        db = LogDB(nprocs=2, filenames=[])
+        db.add_paths([str(sample_log_dir / "*.log")])
+        try:
+            db.query(["CaseName"])
+            logfields.add(Field(name="MyKey", patterns=["my key[ \t]+=[ \t]+(.+)"]))
+            records = db.query(["MyKey"])
+        finally:
+            db.close()
+
+        assert sorted(x[0]["MyKey"] for x in records) == ["value-101", "value-102"]
+
+    def test_context_manager(self, sample_log_dir):
+        """Worker processes are terminated on exiting a block."""
+        with LogDB(nprocs=2, filenames=[]) as db:
+            db.add_paths([str(sample_log_dir / "*.log")])
+            db.query(["CaseName"])
+            workers = db._pool
+
+        assert db._pool is None
+        assert workers._state == pool.TERMINATE
+
+    def test_reset(self, sample_log_dir):
+        """Worker processes are terminated by reset()."""
+        db = LogDB(nprocs=2, filenames=[])
+        db.add_paths([str(sample_log_dir / "*.log")])
+        db.query(["CaseName"])
+        workers = db._pool
+        db.reset()
+
+        assert db._pool is None
+        assert workers._state == pool.TERMINATE
+
+    def test_finalize(self, sample_log_dir):
+        """Worker processes are terminated when the object is collected."""
+        db = LogDB(nprocs=2, filenames=[])
+        db.add_paths([str(sample_log_dir / "*.log")])
+        db.query(["CaseName"])
+        workers = db._pool
+        del db
+        gc.collect()
+
+        assert workers._state == pool.TERMINATE
+
+    def test_save_legacy(self, sample_log_dir, tmp_path):
+        """Log files saved with legacy hashes are skipped."""
+        output = tmp_path / "saved"
+        output.mkdir()
+        logfile = LogFile(str(sample_log_dir / "101-sample.log"))
+        legacy_path = output / f"{logfile.legacy_hash()}.json"
+        logfile.save(legacy_path)
+
+        db = LogDB(nprocs=1, filenames=[])
+        db.add_paths([str(sample_log_dir / "*.log")])
+        try:
+            db.save(output)
+        finally:
+            db.close()
+
+        saved = [x.name for x in output.glob("*.json")]
+        assert len(saved) == 2
+        assert legacy_path.name in saved
+
+
+class TestSearchFields:
+    @pytest.mark.parametrize("block_size", [1, 64, 1000, 64 * 1024])
+    def test_search(self, sample_fields, sample_log_content, block_size):
+        """Compare with plain re for blocks of any size."""
+        scanner = FieldScanner(sample_fields)
+        candidates = scanner.scan(sample_log_content)
+        matches = data._search_fields(
+            sample_log_content, scanner.table, candidates, block_size
+        )
+
+        assert matches == search_re(sample_fields, sample_log_content)
+        assert matches["Value"] == b"last"
+        assert matches["Order"] == b"1"
+        assert matches["Spread"] == b"late"
+        assert matches["Tail"] == b" across\nlines"
+        assert "Missing" not in matches
+
+    @pytest.mark.parametrize("block_size", [1, 64, 1000])
+    def test_block_boundary(self, sample_fields, block_size):
+        """Matches straddling a block boundary."""
+        scanner = FieldScanner(sample_fields)
+        content = (
+            b"value = "
+            + b"x" * block_size
+            + b"\nspread ="
+            + b"\n" * block_size
+            + b"y\n"
+            + b"z" * block_size
+        )
+        candidates = scanner.scan(content)
+        matches = data._search_fields(content, scanner.table, candidates, block_size)
+
+        assert matches == search_re(sample_fields, content)
+        assert matches["Value"] == b"x" * block_size
+        assert matches["Spread"] == b"y"
+
+    def test_crlf(self, sample_fields, sample_log_content):
+        """Line endings of CRLF."""
+        content = sample_log_content.replace(b"\n", b"\r\n")
+        scanner = FieldScanner(sample_fields)
+        candidates = scanner.scan(content)
+        matches = data._search_fields(content, scanner.table, candidates, 64)
+
+        assert matches == search_re(sample_fields, content)
+        assert matches["Value"] == b"last\r"
+
+
+class TestLogFileSerializerTXT:
+    @pytest.mark.parametrize(
+        "patterns, value",
+        [
+            (["key = (\\d)\\1", "kind = (\\d)\\1"], "7"),
+            (["(?i)key = (.+)", "kind = (.+)"], "77"),
+        ],
+    )
+    def test_load_separate(self, engines, logfields, tmp_path, patterns, value):
+        """Load fields whose patterns cannot be joined with others."""
+        for i, pattern in enumerate(patterns):
+            logfields.add(Field(name=f"Key{i}", patterns=[pattern]))
+        path = tmp_path / "101-sample.log"
+        path.write_bytes(b"kind = 77\n")
+
+        loaded = LogFileSerializerTXT().load(path)
+
+        assert loaded["Key0"] is None
+        assert loaded["Key1"] == value
+
+    @pytest.mark.parametrize("size", [0, data._MMAP_MIN_SIZE])
+    @pytest.mark.parametrize("newline", ["\n", "\r\n"])
+    def test_load(
+        self, logfields, sample_fields, sample_log_content, tmp_path, size, newline
+    ):
+        """Load files read directly or memory-mapped."""
+        for field in sample_fields:
+            logfields.add(field)
+
+        padding = b"[  NORMAL ]  padding\n" * (size // 20)
+        content = (padding + sample_log_content).replace(b"\n", newline.encode())
+        path = tmp_path / "101-sample.log"
+        path.write_bytes(content)
+        assert (path.stat().st_size >= data._MMAP_MIN_SIZE) == (size > 0)
+
+        loaded = LogFileSerializerTXT().load(path)
+        matches = search_re(sample_fields, content)
+
+        assert loaded["JobId"] == "101"
+        assert loaded["Value"] == "last"
+        assert loaded["Missing"] is None
+        for name, value in matches.items():
+            value = value.decode("utf-8")
+            assert loaded[name] == (value[:-1] if value.endswith("\r") else value)
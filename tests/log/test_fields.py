@@ -0,0 +1,112 @@
+"""Tests for module log.fields"""
+
+import re
+import pytest
+from antmocdata.log import fields
+from antmocdata.log.fields import Field, FieldScanner
+
+
+class TestPatternHelpers:
+    @pytest.mark.parametrize(
+        "pattern, hint",
+        [
+            ("case name[ \t]+=[ \t]+(.+)", "case name"),
+            ("(\\d+) Azimuthal", " azimuthal"),
+            ("\\d+", ""),
+            ("[", ""),
+        ],
+    )
+    def test_literal_hint(self, pattern, hint):
+        """The longest lowercase literal of a pattern."""
+        assert fields._literal_hint(pattern) == hint
+
+    @pytest.mark.parametrize(
+        "pattern, linewise",
+        [
+            ("key[ \t]+=[ \t]+(.+)", True),
+            ("\\bkey\\b = (\\w+)", True),
+            ("key = ([^\n]+)", True),
+            ("key\\s*=\\s*(\\w+)", False),
+            ("key:([^x]+)!", False),
+            ("^key = (.+)", False),
+            ("(?s)key = (.+)", False),
+            ("(?<=key) = (.+)", False),
+            ("[", False),
+        ],
+    )
+    def test_is_linewise(self, pattern, linewise):
+        """Patterns whose matches never span lines."""
+        assert fields._is_linewise(pattern) == linewise
+
+    @pytest.mark.parametrize(
+        "pattern, joinable",
+        [
+            ("key = (.+)", True),
+            ("key = (?i:x)(.+)", True),
+            ("key = (\\d)\\1", False),
+            ("key = (\\d)(?:a|(?:b|\\1))", False),
+            ("key = (a)?(?(1)b|c)", False),
+            ("(?i)key = (.+)", False),
+            ("key = (?P<value>.+)", False),
+            ("[", False),
+        ],
+    )
+    def test_is_joinable(self, pattern, joinable):
+        """Patterns which can be joined into an alternation."""
+        assert fields._is_joinable(pattern) == joinable
+
+    @pytest.mark.parametrize(
+        "pattern, literal",
+        [
+            ("Key = (.+)", "k"),
+            ("(key) = (.+)", None),
+            ("\\d+", None),
+            ("[", None),
+        ],
+    )
+    def test_leading_literal(self, pattern, literal):
+        """The leading literal character of a pattern."""
+        assert fields._leading_literal(pattern) == literal
+
+
+class TestFieldScanner:
+    def test_engines(self, engines):
+        """Regex engines are chosen by the optional packages available."""
+        field = Field(name="Key", patterns=["key = (.+)"])
+        scanner = FieldScanner([field])
+
+        assert isinstance(field.regexes[0], fields._RE2Regex) == (
+            fields.re2 is not None
+        )
+        assert (scanner.database is not None) == (fields.hyperscan is not None)
+
+    def test_scan(self, sample_fields, sample_log_content):
+        """Every pattern occurring in the content is reported."""
+        scanner = FieldScanner(sample_fields)
+        for content in [sample_log_content, sample_log_content.upper(), b""]:
+            found = scanner.scan(content)
+            for field in sample_fields:
+                for i, pattern in enumerate(field.patterns):
+                    if re.search(pattern.encode("utf-8"), content, re.I):
+                        assert (field.name, i) in found
+
+        found = scanner.scan(sample_log_content)
+        assert ("Missing", 0) not in found
+        assert scanner.scan(b"") == scanner.always
+
+    @pytest.mark.parametrize(
+        "patterns",
+        [
+            ["key = (\\d)\\1", "kind = (\\d)\\1"],
+            ["(?i)key = (.+)", "kind = (.+)"],
+            ["key = (?P<value>.+)", "kind = (?P<value>.+)"],
+        ],
+    )
+    def test_scan_separate(self, engines, patterns):
+        """Patterns which cannot be joined with others."""
+        scanner = FieldScanner(
+            [Field(name=f"Key{i}", patterns=[x]) for i, x in enumerate(patterns)]
+        )
+
+        assert ("Key1", 0) in scanner.scan(b"kind = 77\n")
+        assert ("Key0", 0) in scanner.scan(b"key = 77\n")
@@ -1,5 +1,6 @@
 """Common fixtures"""
 
+import copy
 import pytest
 import numpy as np
 import xml.etree.ElementTree as ET
@@ -19,9 +20,10 @@ def sample_material():
     return Material(name="A", ngroups=2, data=data)
 
 
-@pytest.fixture
-def sample_xml_tree():
-    return ET.ElementTree(ET.fromstring(
+@pytest.fixture(scope="session")
+def sample_xml_root():
+    """XML root parsed once for all tests, see sample_xml_tree."""
+    return ET.fromstring(
         """<?xml version="1.0" encoding="utf-8"?>
         <MATERIALS>
             <material name="A" set="1" density="0." temperature="600K" label="Material A">
@@ -35,4 +37,10 @@ def sample_xml_tree():
             </material>
         </MATERIALS>
         """
-        ))
+        )
+
+
+@pytest.fixture
+def sample_xml_tree(sample_xml_root):
+    # Tests may modify the tree, so each of them gets a copy
+    return ET.ElementTree(copy.deepcopy(sample_xml_root))
@@ -5,9 +5,11 @@ import h5py
 import pathlib
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="module")
 def sample_h5_input():
-    """An H5 file path for testing."""
+    """An H5 file path for testing.
+    The file is read-only, so it is opened once for all tests in a module.
+    """
     # Get the path of the sample file
     path = pathlib.Path(__file__).parent.absolute() / "mgxs.h5"
 
@@ -25,9 +27,6 @@ def sample_h5_output():
 
     # Yield an H5 file object and do some clean after testing
     h5_output = h5py.File(str(path), 'w')
-    h5_output.close()
-
-    h5_output = h5py.File(str(path), 'r+')
     yield h5_output
     h5_output.close()
     path.unlink()
@@ -6,6 +6,7 @@ Date:   January 24, 2021
 
 import pytest
 import antmocdata.mgxs.manip.h5 as manip
+from antmocdata.mgxs import Material
 
 
 class TestDataIO:
@@ -22,6 +23,18 @@ class TestDataIO:
 
         assert ngroups == 6
 
+    def test_dump_xsindices(self, sample_h5_output):
+        """Dump XS indices as separate attributes or a single table."""
+        xsindices = {"absorption": 0, "fission": 1, "nu-fission": 3}
+        manip.dump_xsindices(sample_h5_output, xsindices)
+
+        assert manip.load_xsindices(sample_h5_output) == xsindices
+
+        xsindices = {"absorption": 1, "transport": 0, "chi": 4}
+        manip.dump_xsindices(sample_h5_output, xsindices, table=True)
+
+        assert manip.load_xsindices(sample_h5_output) == xsindices
+
     def test_undefined_layout(self, sample_h5_input):
         """Undefined material data file layout."""
         with pytest.raises(ValueError):
@@ -41,6 +54,62 @@ class TestDataIO:
 
         assert True
 
+    def test_dump_materials_xsindices(self, sample_material, sample_h5_output,
+                                      monkeypatch):
+        """Dump materials with a customized index map."""
+        xsindices = {
+            "absorption": 1,
+            "fission": 0,
+            "transport": 2,
+            "nu-fission": 3,
+            "chi": 6,
+        }
+        monkeypatch.setattr(Material, "xsindices", xsindices)
+        materials = {sample_material.name: sample_material}
+
+        manip.dump_materials(materials=materials, file=sample_h5_output,
+                             layout="compact")
+
+        reactions = sample_h5_output["material"][sample_material.name]["reactions"]
+        assert reactions.shape == (2, 7)
+        for xsname, xsindex in xsindices.items():
+            assert (reactions[:, xsindex] == sample_material[xsname]).all()
+
+        materials = manip.load_materials(sample_h5_output, layout="compact")
+        assert materials[sample_material.name] == sample_material
+
+    def test_dump_materials_permuted(self, sample_material, sample_h5_output,
+                                     monkeypatch):
+        """Dump materials with a permuted index map without gaps."""
+        xsindices = {
+            "chi": 0,
+            "nu-fission": 2,
+            "absorption": 1,
+            "transport": 4,
+            "fission": 3,
+        }
+        monkeypatch.setattr(Material, "xsindices", xsindices)
+        materials = {sample_material.name: sample_material}
+
+        manip.dump_materials(materials=materials, file=sample_h5_output,
+                             layout="compact")
+
+        reactions = sample_h5_output["material"][sample_material.name]["reactions"]
+        assert reactions.shape == (2, 5)
+        for xsname, xsindex in xsindices.items():
+            assert (reactions[:, xsindex] == sample_material[xsname]).all()
+
+    def test_load_materials_xsindices(self, sample_material, sample_h5_output,
+                                      monkeypatch):
+        """Load materials with an index map wider than the file."""
+        materials = {sample_material.name: sample_material}
+        manip.dump_materials(materials=materials, file=sample_h5_output,
+                             layout="compact")
+
+        monkeypatch.setitem(Material.xsindices, "chi", 6)
+        with pytest.raises(ValueError):
+            manip.load_materials(sample_h5_output, layout="compact")
+
     def test_convert_layout(self, sample_h5_input, sample_h5_output):
         """Conversion between 'named' and 'compact' layouts."""
         manip.convert_layout(
@@ -55,6 +124,19 @@ class TestDataIO:
         for name in named_materials:
             assert named_materials[name] == compact_materials[name]
 
+    def test_convert_layout_attributes(self, sample_material, sample_h5_output,
+                                       tmp_path):
+        """Conversion keeps material descriptions."""
+        sample_material.info = "Material A"
+        materials = {sample_material.name: sample_material}
+        with manip.open_h5(tmp_path / "named.h5", "w") as named:
+            manip.dump_materials(materials=materials, file=named)
+            manip.convert_layout(inputfile=named, outputfile=sample_h5_output)
+
+        material = manip.load_materials(sample_h5_output, layout="compact")["A"]
+        assert material == sample_material
+        assert material.info == "Material A"
+
 
 class TestFixMaterials:
     def test_fix_scatter_matrix(self, sample_h5_input, sample_h5_output):
@@ -86,3 +168,9 @@ class TestCheckMaterials:
     def test_check_sigma_t(self, sample_h5_input):
         """Check 'total' and 'transport'."""
         assert manip.check_sigma_t(sample_h5_input) is False
+
+    def test_check_snapshot(self, sample_h5_input):
+        """Run the checks on materials read once."""
+        materials = manip.snapshot_materials(sample_h5_input)
+        assert manip.check_negative_xs(materials) is True
+        assert manip.check_sigma_t(materials) is False
@@ -28,6 +28,20 @@ class TestReadMaterials:
         assert material_b.info == "Material B"
         assert material_b.weights[14028] == 2.9073e-4
 
+    def test_iter_materials(self, sample_xml_tree, tmp_path):
+        """Read objects from an XML file one by one."""
+        path = tmp_path / "materials.xml"
+        sample_xml_tree.write(path)
+
+        materials = manip.find_materials(sample_xml_tree)
+        names = []
+        for material in manip.iter_materials(str(path)):
+            assert material == materials[material.name]
+            assert material.weights == materials[material.name].weights
+            names.append(material.name)
+
+        assert names == list(materials)
+
     def test_read_single_material(self, sample_xml_tree):
         """Read a single object."""
         node = sample_xml_tree.getroot()[0]
@@ -42,6 +56,10 @@ class TestReadMaterials:
         # Print the material
         print(material)
 
+        # Sum up weights which have been converted to floats
+        material.compute_density()
+        assert material.density == 1.1E+00
+
     def test_invalid_nuclide_id(self):
         """Invalid nuclide id."""
         tree = ET.ElementTree(ET.fromstring(
@@ -65,6 +83,17 @@ class TestModifyXML:
 
         assert float(node.get("density")) == 1.1E+00
 
+    def test_stream_materials(self, sample_xml_tree, tmp_path):
+        """Reset densities for materials in an XML file one by one."""
+        source = tmp_path / "materials.xml"
+        output = tmp_path / "materials-new.xml"
+        sample_xml_tree.write(source)
+
+        manip.stream_materials(str(source), str(output), manip.reset_density)
+        xmltree = manip.reset_all_densities(sample_xml_tree)
+
+        assert output.read_bytes() == ET.tostring(xmltree.getroot())
+
     def test_replace_nuclide_ids(self, sample_xml_tree):
         """Replace nuclide ids."""
         warnings.simplefilter("error")
@@ -37,3 +37,13 @@ class TestMaterial:
         material_b["absorption"] += 1E-12
 
         assert material_a != material_b
+
+    def test_not_equal_names(self, sample_material):
+        """Operator '!=' on different cross-section names"""
+        material_a = sample_material
+        material_b = material_a.copy()
+
+        array = material_b.data.pop("absorption")
+        material_b["total"] = array
+
+        assert material_a != material_b
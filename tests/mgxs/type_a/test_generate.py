@@ -0,0 +1,37 @@
+"""Tests for module generate.
+
+Author: An Wang, USTB (wangan.cs@gmail.com)
+Date:   January 23, 2021
+"""
+
+import xml.etree.ElementTree as ET
+from antmocdata.mgxs.type_a.generate import setup_materials
+
+
+class TestSetupMaterials:
+    def test_nprocs(self, sample_nuclideset):
+        """Materials computed by worker processes."""
+        xmltree = ET.ElementTree(ET.fromstring(
+            """<?xml version="1.0" encoding="utf-8"?>
+            <MATERIALS>
+                <material name="A" set="1" label="Material A">
+                    <nuclide id="1102301" radio="1E+0"/>
+                    <nuclide id="1402801" radio="1E-1"/>
+                </material>
+                <material name="B" set="1" label="Material B">
+                    <nuclide id="1102302" radio="2.1618e-2"/>
+                </material>
+                <material name="C" set="2" label="Material C">
+                    <nuclide id="1102302" radio="2.1618e-2"/>
+                </material>
+            </MATERIALS>
+            """
+            ))
+        nuclidesets = {sample_nuclideset.uid: sample_nuclideset}
+
+        serial = setup_materials(xmltree, nuclidesets)
+        parallel = setup_materials(xmltree, nuclidesets, nprocs=2)
+
+        assert list(serial) == list(parallel)
+        for name in serial:
+            assert serial[name] == parallel[name]
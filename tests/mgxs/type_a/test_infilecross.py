@@ -5,6 +5,7 @@ Date:   January 22, 2021
 """
 
 import pytest
+import numpy as np
 from antmocdata.mgxs.type_a import infilecross
 
 
@@ -44,6 +45,13 @@ class TestParseNuclideName:
         with pytest.raises(KeyError):
             infilecross.parse_nuclide_name("EEZO-0")
 
+    def test_5(self):
+        """Elements map given as a dictionary."""
+        elementmap = {"EEZO": [200]}
+        assert infilecross.parse_nuclide_name("EEZO-0", elementmap) == ('EEZO', 200, 0)
+        with pytest.raises(KeyError):
+            infilecross.parse_nuclide_name("OXYGEN-16", elementmap)
+
 
 class TestParseNuclideSetId:
     """Tests for robustness."""
@@ -76,7 +84,7 @@ class TestParseChi:
         string = "0.57564402E+00  0.29341474E+00  0.12731624E+00  0.30919870E-02"
         oracle = [0.57564402E+00, 0.29341474E+00, 0.12731624E+00, 0.30919870E-02]
 
-        assert infilecross.parse_chi(string) == oracle
+        assert np.array_equal(infilecross.parse_chi(string), oracle)
 
     def test_2(self):
         with pytest.raises(ValueError):
@@ -124,7 +132,9 @@ class TestParseXSArrays:
 
         results = infilecross.parse_xs_arrays(strings)
 
-        assert results == oracle
+        assert results.keys() == oracle.keys()
+        for xs_name in oracle:
+            assert np.array_equal(results[xs_name], oracle[xs_name])
 
     def test_2(self):
         strings = [
@@ -154,7 +164,7 @@ class TestParseScatterMatrix:
 
         results = infilecross.parse_scatter_matrix(strings)
 
-        assert results == oracle
+        assert np.array_equal(results, oracle)
 
     def test_2(self):
         strings = [
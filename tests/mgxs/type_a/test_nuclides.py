@@ -0,0 +1,72 @@
+"""Tests for module nuclides.
+
+Author: An Wang, USTB (wangan.cs@gmail.com)
+Date:   January 23, 2021
+"""
+
+import pytest
+import numpy as np
+from antmocdata.mgxs.type_a import Nuclide
+
+
+class TestNuclideSet:
+    def test_row(self, sample_nuclideset):
+        """Rows of nuclides follow the order of the set."""
+        assert sample_nuclideset.row(11023) == 0
+        assert sample_nuclideset.row(14028) == 1
+
+        with pytest.raises(KeyError):
+            sample_nuclideset.row(6012)
+
+    def test_as_matrix(self, sample_nuclideset):
+        """Pack a cross-section of all nuclides by rows."""
+        matrix = sample_nuclideset.as_matrix("absorption")
+
+        assert matrix.shape == (2, 2)
+        assert matrix.flags.c_contiguous
+        for nuclideid, nuclide in sample_nuclideset.nuclides.items():
+            row = sample_nuclideset.row(nuclideid)
+            assert (matrix[row] == nuclide["absorption"]).all()
+
+        matrix = sample_nuclideset.as_matrix("scatter matrix")
+        assert matrix.shape == (2, 4)
+
+    def test_as_matrix_assigned(self, sample_nuclideset):
+        """Matrices are rebuilt after cross-sections of nuclides are assigned."""
+        nuclide = sample_nuclideset[14028]
+        sample_nuclideset.as_matrix("absorption")
+        sample_nuclideset.as_matrix("nu-fission")
+
+        nuclide["absorption"] = np.array([5.0, 6.0])
+        nuclide["nu"] = np.array([2.0, 2.0])
+
+        row = sample_nuclideset.row(14028)
+        assert (sample_nuclideset.as_matrix("absorption")[row] == [5.0, 6.0]).all()
+        assert (sample_nuclideset.as_matrix("nu-fission")[row] ==
+                2.0 * nuclide["fission"]).all()
+
+    def test_as_matrix_added(self, sample_nuclideset):
+        """Matrices and rows are rebuilt after a nuclide is added."""
+        sample_nuclideset.as_matrix("absorption")
+        sample_nuclideset.row(11023)
+
+        nuclide = Nuclide(name="C", number=6, mass=12, ngroups=2)
+        nuclide["absorption"] = np.array([7.0, 8.0])
+        sample_nuclideset.add_nuclide(nuclide)
+
+        matrix = sample_nuclideset.as_matrix("absorption")
+        assert matrix.shape == (3, 2)
+        assert (matrix[sample_nuclideset.row(6012)] == [7.0, 8.0]).all()
+
+    def test_replaced_nuclide(self, sample_nuclideset):
+        """A nuclide replaced in a set no longer affects its matrices."""
+        replaced = sample_nuclideset[14028]
+        nuclide = Nuclide(name="SI", number=14, mass=28, ngroups=2)
+        nuclide["absorption"] = np.array([3.0, 4.0])
+        sample_nuclideset.add_nuclide(nuclide)
+
+        matrix = sample_nuclideset.as_matrix("absorption")
+        replaced["absorption"] = np.array([9.0, 9.0])
+
+        assert sample_nuclideset.as_matrix("absorption") is matrix
+        assert (matrix[sample_nuclideset.row(14028)] == [3.0, 4.0]).all()
@@ -0,0 +1,41 @@
+"""Fixtures for testing module solution"""
+
+import pytest
+from antmocdata.solution import rxvtk
+
+
+@pytest.fixture(params=["numba", "numpy"])
+def kernels(request, monkeypatch):
+    """Kernels compiled by numba, or the NumPy fallback."""
+    if request.param == "numba":
+        if rxvtk.numba is None:
+            pytest.skip("numba is not available")
+    else:
+        monkeypatch.setattr(rxvtk, "_scatter", rxvtk._scatter_numpy)
+        monkeypatch.setattr(rxvtk, "_sum_and_nnz", rxvtk._sum_and_nnz_numpy)
+    return request.param
+
+
+@pytest.fixture
+def write_vtk(tmp_path):
+    """Return a function writing data arrays of a mesh to a VTK file."""
+
+    def write(arrays, extent=(2, 2, 2), num_cells_xy=3):
+        lines = [
+            '<?xml version="1.0"?>',
+            '<VTKFile type="UnstructuredGrid" version="0.1">',
+            "<UnstructuredGrid>",
+            f'<Piece Extent="{extent[0]} {extent[1]} {extent[2]}" '
+            f'NumberOfCellsXY="{num_cells_xy}">',
+            "<CellData>",
+        ]
+        for name, values in arrays.items():
+            text = " ".join(str(x) for x in values)
+            lines.append(f'<DataArray Name="{name}" format="ascii">{text}</DataArray>')
+        lines += ["</CellData>", "</Piece>", "</UnstructuredGrid>", "</VTKFile>"]
+
+        path = tmp_path / "reaction_rates.vtu"
+        path.write_text("\n".join(lines))
+        return path
+
+    return write
@@ -0,0 +1,107 @@
+"""Tests for module solution.rxvtk"""
+
+import io
+import pytest
+import numpy as np
+from antmocdata.solution import load_vtk, normalize
+
+
+def scatter_cells(values, indices, nx, ny, nz, num_cells_xy):
+    """Place values of valid cells in a 3D array, reverting the y-axis."""
+    result = np.zeros((nz, ny, nx))
+    for z in range(nz):
+        for count in range(num_cells_xy):
+            i = indices[z * num_cells_xy + count]
+            result[z, ny - 1 - i // nx % ny, i % nx] = values[z * num_cells_xy + count]
+    return result
+
+
+class TestLoadVTK:
+    indices = [0, 1, 3, 3, 2, 0]
+    fission = [1.5, 2.0, 3.0, 4.0, 5.0, 6.25]
+    flux = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]
+
+    @pytest.mark.parametrize("position", [0, 1, 2])
+    @pytest.mark.parametrize("dtype", [np.float32, np.float64])
+    def test_load(self, kernels, write_vtk, position, dtype):
+        """Data arrays placed before or after the valid indices."""
+        arrays = [("Fission RX", self.fission), ("Flux", self.flux)]
+        arrays.insert(position, ("Valid Indices", self.indices))
+        path = write_vtk(dict(arrays))
+
+        loaded = load_vtk(str(path), dtype=dtype)
+
+        assert list(loaded) == [name for name, _ in arrays]
+        for name, values in arrays:
+            assert loaded[name].dtype == dtype
+            assert loaded[name].shape == (2, 2, 2)
+            expected = scatter_cells(values, self.indices, 2, 2, 2, 3)
+            assert np.allclose(loaded[name], expected)
+
+    def test_full_coverage(self, kernels, write_vtk):
+        """Every cell of the mesh is valid."""
+        indices = [1, 0, 3, 2]
+        values = [1.0, 2.0, 3.0, 4.0]
+        path = write_vtk({"Flux": values, "Valid Indices": indices},
+                         extent=(2, 2, 1), num_cells_xy=4)
+
+        with open(path, "rb") as file:
+            loaded = load_vtk(io.BytesIO(file.read()))
+
+        assert np.array_equal(loaded["Flux"], scatter_cells(values, indices, 2, 2, 1, 4))
+
+    def test_filters(self, kernels, write_vtk):
+        """Only data arrays matching the filters are imported."""
+        path = write_vtk({"Valid Indices": self.indices, "Fission RX": self.fission,
+                          "Flux": self.flux})
+
+        loaded = load_vtk(str(path), filters=["Fis", "^Fl"])
+
+        assert list(loaded) == ["Fission RX", "Flux"]
+
+    @pytest.mark.parametrize("arrays", [
+        {"Valid Indices": [0, 1, 3, 3, 2, 0], "Flux": [0.1, 0.2, 0.3]},
+        {"Flux": [0.1, 0.2, 0.3, 0.4, 0.5, 0.6], "Valid Indices": [0, 1, 3]},
+        {"Flux": [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]},
+        ])
+    def test_short_arrays(self, kernels, write_vtk, arrays):
+        """Data arrays or valid indices shorter than the mesh."""
+        path = write_vtk(arrays)
+
+        with pytest.raises(ValueError):
+            load_vtk(str(path))
+
+
+class TestNormalize:
+    @pytest.mark.parametrize("dtype", [np.float32, np.float64])
+    def test_normalize(self, kernels, dtype):
+        """Scale data so that non-zeros average to 1."""
+        data = np.array([[0.0, 1.0, 2.0], [3.0, 0.0, 6.0]], dtype=dtype)
+
+        normalized = normalize(data)
+
+        assert normalized.dtype == dtype
+        assert np.allclose(normalized, data * 4 / 12)
+        assert np.isclose(normalized[normalized != 0].mean(), 1.0)
+
+    def test_non_contiguous(self, kernels):
+        """Normalize a strided view."""
+        data = np.arange(24, dtype=np.float64).reshape(2, 3, 4)
+        view = data[:, ::2, ::-1].transpose(2, 0, 1)
+        assert not view.flags.c_contiguous
+
+        normalized = normalize(view)
+
+        count = np.count_nonzero(view)
+        assert np.allclose(normalized, view * count / view.sum())
+
+    @pytest.mark.parametrize("dtype", [np.float32, np.float64])
+    def test_zeros(self, kernels, dtype):
+        """Arrays of zeros are normalized to NaN with a warning."""
+        data = np.zeros(4, dtype=dtype)
+
+        with pytest.warns(RuntimeWarning):
+            normalized = normalize(data)
+
+        assert normalized.dtype == dtype
+        assert np.isnan(normalized).all()